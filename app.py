@@ -1,82 +1,390 @@
-from flask import Flask, jsonify, request
+"""The Flask app for the listing API.
 
-from calendar_api import build_calendar
-from currencies import Currency
+``create_app`` builds an application; the module attribute ``app`` is a
+default one, created on first access so importing this module stays cheap:
+
+    flask --app app run
+
+Nothing slow happens until it is needed: the exchange rate client, its
+snapshot and the rate history load on the first request that converts a
+price, and the listing store loads on the first request that reads it. With
+``WARMUP`` configured the store is loaded from its snapshot file in the
+background as soon as the app is created instead.
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from flask import Flask, Response, current_app, g, request
+from flask.json.provider import DefaultJSONProvider
+
+import metrics
+from calendar_cache import CalendarCache
 from invalid import InvalidRequest
 from listing.api import (
+    bulk_create_listings,
+    calendars_request,
     create_new_listing,
     delete_listing_by_id,
+    export_listings,
     listing_by_id,
+    listing_calendar_request,
     listing_get_request,
     update_existing_listing,
-    validate_currency,
 )
-from listing.model import Listing
+from listing.repository import ListingRepository
+from listing.store import ListingStore
 from markets import Markets
-from open_exchange import RateConverter, get_rate_converter, latest_rates
+from open_exchange import RateConverter, get_rate_converter, load_env
+from profiling import (
+    DEFAULT_KEEP,
+    DEFAULT_THRESHOLD_MS,
+    ProfileStore,
+    RequestProfiler,
+    is_admin,
+)
+from reply import Reply, dumps, json_reply, loads
 
-app = Flask(__name__)
-app.rate_converter = get_rate_converter(app.testing)
 
+class JSONProvider(DefaultJSONProvider):
+    """Flask JSON through ``reply.dumps``/``reply.loads`` (orjson if installed).
 
-@app.errorhandler(InvalidRequest)
-def handle_invalid_error(error):
-    response = jsonify(error.to_dict())
-    response.status_code = error.status_code
+    Only compact encoding is routed there; anything else, including types
+    only Flask knows how to encode, goes to the default provider.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs == {"separators": (",", ":")}:
+            try:
+                return dumps(obj)
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+
+class ListingApp(Flask):
+    """Flask with a ``rate_converter`` built from the config on first use."""
+
+    json_provider_class = JSONProvider
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calendar_cache = CalendarCache()
+        self._rate_converter: Optional[RateConverter] = None
+        self._rate_converter_lock = threading.Lock()
+
+    @property
+    def rate_converter(self) -> RateConverter:
+        if (converter := self._rate_converter) is None:
+            with self._rate_converter_lock:
+                if (converter := self._rate_converter) is None:
+                    converter = self._rate_converter = build_rate_converter(self.config)
+        return converter
+
+    @rate_converter.setter
+    def rate_converter(self, converter: RateConverter):
+        self._rate_converter = converter
+
+
+def build_rate_converter(config) -> RateConverter:
+    base_dir = Path(config.get("BASE_DIR", "."))
+    converter = get_rate_converter(
+        config.get("TESTING", False),
+        snapshot_path=base_dir / "data" / "rates.json",
+        refresh_interval=config.get("RATES_REFRESH_SECONDS"),
+    )
+    history_path = Path(
+        config.get("RATES_HISTORY_PATH", base_dir / "data" / "rates_history.bin")
+    )
+    if history_path.exists():
+        from rate_history import RateHistory
+
+        converter.history = RateHistory(history_path)
+    return converter
+
+
+Route = Tuple[str, Callable[..., Response], dict]
+
+routes: List[Route] = []
+
+
+def route(rule: str, **options):
+    def register(view: Callable[..., Response]):
+        routes.append((rule, view, options))
+        return view
+
+    return register
+
+
+def create_app(config: Optional[dict] = None) -> ListingApp:
+    """A new app configured from ``LISTING_API_*`` variables, then ``config``."""
+    load_env()
+    app = ListingApp(__name__)
+    app.config.from_prefixed_env("LISTING_API")
+    app.config.update(config or {})
+    for rule, view, options in routes:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.register_error_handler(InvalidRequest, handle_invalid_error)
+    # the profiler wraps the request timer so saving a profile is not timed
+    app.before_request(start_profiler)
+    app.after_request(save_profile)
+    app.teardown_request(stop_profiler)
+    app.before_request(start_timer)
+    app.after_request(observe_request)
+    if app.config.get("WARMUP"):
+        threading.Thread(
+            target=warm_up, args=(app,), name="listing-warmup", daemon=True
+        ).start()
+    return app
+
+
+def warm_up(app: Flask):
+    """Load the listing store ahead of the first request."""
+    with app.app_context():
+        listing_repository().refresh()
+
+
+_default_app: Optional[ListingApp] = None
+_default_app_lock = threading.Lock()
+
+
+def __getattr__(name: str):
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    global _default_app
+    with _default_app_lock:
+        if _default_app is None:
+            _default_app = create_app()
+    return _default_app
+
+
+def listing_repository() -> ListingRepository:
+    base_dir = Path(current_app.config.get("BASE_DIR", ".")).resolve()
+    repositories = current_app.extensions.setdefault("listing_repositories", {})
+    if (repository := repositories.get(base_dir)) is None:
+        store = ListingStore.for_dir(base_dir)
+        if current_app.config.get("LISTING_SHARED", False):
+            # imported here like NumPy, only for the worker mode that needs it
+            from listing.shared import SharedListingRepository
+
+            repository = SharedListingRepository(store)
+        else:
+            repository = ListingRepository(
+                store, columnar=current_app.config.get("LISTING_COLUMNAR", False)
+            )
+        repositories[base_dir] = repository
+        repository.listeners.append(current_app.calendar_cache.invalidate)
+    return repository
+
+
+def profile_store() -> ProfileStore:
+    config = current_app.config
+    default_dir = Path(config.get("BASE_DIR", ".")) / "data" / "profiles"
+    directory = Path(config.get("PROFILES_DIR", default_dir)).resolve()
+    stores = current_app.extensions.setdefault("profile_stores", {})
+    if (store := stores.get(directory)) is None:
+        store = stores[directory] = ProfileStore(
+            directory, config.get("PROFILES_KEEP", DEFAULT_KEEP)
+        )
+    return store
+
+
+def to_response(reply: Reply) -> Response:
+    return Response(
+        reply.body, status=reply.status, headers=reply.headers, mimetype=reply.mimetype
+    )
+
+
+def metrics_request() -> Reply:
+    return Reply(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
+
+def profiles_request(store: ProfileStore) -> Reply:
+    return json_reply([entry.to_dict() for entry in store.entries()])
+
+
+def profile_request(store: ProfileStore, name: str) -> Reply:
+    if (data := store.read(name)) is None:
+        raise InvalidRequest("unable to find profile", status_code=404)
+    mimetype = "text/html" if name.endswith(".html") else "application/octet-stream"
+    headers = {"Content-Disposition": f"attachment; filename={name}"}
+    return Reply(data, headers=headers, mimetype=mimetype)
+
+
+def require_profiling_admin():
+    if not is_admin(request.headers, current_app.config.get("PROFILING_TOKEN")):
+        raise InvalidRequest("profiling token required", status_code=403)
+
+
+def error_reply(error: InvalidRequest) -> Reply:
+    return json_reply(error.to_dict(), status=error.status_code)
+
+
+def markets_request() -> Reply:
+    return json_reply([market.to_dict() for market in Markets.get_all()])
+
+
+def rates_status_request(rate_converter) -> Reply:
+    if (snapshot := rate_converter.snapshot()) is None:
+        raise InvalidRequest("no exchange rates available", status_code=503)
+    return json_reply(
+        {
+            "snapshot_id": snapshot.id,
+            "fetched_at": snapshot.fetched_at,
+            "age_seconds": snapshot.age(),
+        }
+    )
+
+
+def start_profiler():
+    if current_app.config.get("PROFILING") or is_admin(
+        request.headers, current_app.config.get("PROFILING_TOKEN")
+    ):
+        # unprofiled when another request is being profiled already
+        if (profiler := RequestProfiler.start()) is not None:
+            g.profiler = profiler
+
+
+def save_profile(response: Response) -> Response:
+    if (profiler := g.pop("profiler", None)) is None:
+        return response
+    duration = profiler.stop()
+    threshold = current_app.config.get("PROFILE_THRESHOLD_MS", DEFAULT_THRESHOLD_MS)
+    if duration * 1000 >= threshold:
+        response.headers["X-Profile-Name"] = profile_store().save(
+            profiler.output(),
+            request.endpoint or "unmatched",
+            duration,
+            profiler.format,
+        )
+    return response
+
+
+def stop_profiler(error):
+    # only still set when the request failed before ``save_profile`` ran
+    if (profiler := g.pop("profiler", None)) is not None:
+        profiler.stop()
+
+
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+def observe_request(response: Response) -> Response:
+    if (started := g.pop("request_started", None)) is not None:
+        metrics.REQUEST_SECONDS.labels(request.endpoint or "unmatched").observe(
+            time.perf_counter() - started
+        )
     return response
 
 
-@app.route("/markets")
+def handle_invalid_error(error):
+    return to_response(error_reply(error))
+
+
+@route("/metrics", methods=["GET"])
+def get_metrics():
+    return to_response(metrics_request())
+
+
+@route("/profiles", methods=["GET"])
+def list_profiles():
+    require_profiling_admin()
+    return to_response(profiles_request(profile_store()))
+
+
+@route("/profiles/<name>", methods=["GET"])
+def get_profile(name: str):
+    require_profiling_admin()
+    return to_response(profile_request(profile_store(), name))
+
+
+@route("/markets")
 def markets():
-    return jsonify([market.to_dict() for market in Markets.get_all()])
+    return to_response(markets_request())
+
 
+@route("/rates/status", methods=["GET"])
+def rates_status():
+    return to_response(rates_status_request(current_app.rate_converter))
 
-@app.get("/listings")
+
+@route("/listings", methods=["GET"])
 def get_listings():
-    base_dir = app.config.get("BASE_DIR", ".")
-    return listing_get_request(request, base_dir, app.rate_converter)
+    return to_response(
+        listing_get_request(
+            request.args, listing_repository(), current_app.rate_converter
+        )
+    )
 
 
-@app.post("/listings")
+@route("/listings", methods=["POST"])
 def post_listings():
-    base_dir = app.config.get("BASE_DIR", ".")
-    return create_new_listing(base_dir, request.json)
+    return to_response(create_new_listing(listing_repository(), request.json))
+
+
+@route("/listings/bulk", methods=["POST"])
+def post_listings_bulk():
+    return to_response(
+        bulk_create_listings(listing_repository(), request.get_data(), request.mimetype)
+    )
 
 
-@app.get("/listings/<int:listing_id>")
+@route("/listings/export", methods=["GET"])
+def export():
+    return to_response(export_listings(listing_repository()))
+
+
+@route("/listings/<int:listing_id>", methods=["GET"])
 def get_listing(listing_id: int):
-    base_dir = app.config.get("BASE_DIR", ".")
-    existing_lkp = Listing.existing_lookup(base_dir)
-    return listing_by_id(existing_lkp, listing_id)
+    return to_response(listing_by_id(listing_repository(), listing_id))
 
 
-@app.put("/listings/<int:listing_id>")
+@route("/listings/<int:listing_id>", methods=["PUT"])
 def put_listing(listing_id: int):
-    base_dir = app.config.get("BASE_DIR", ".")
-    existing_lkp = Listing.existing_lookup(base_dir)
-    return update_existing_listing(existing_lkp, listing_id, base_dir, request.json)
+    return to_response(
+        update_existing_listing(listing_repository(), listing_id, request.json)
+    )
 
 
-@app.delete("/listings/<int:listing_id>")
+@route("/listings/<int:listing_id>", methods=["DELETE"])
 def delete_listing(listing_id: int):
-    base_dir = app.config.get("BASE_DIR", ".")
-    return delete_listing_by_id(Listing.existing_lookup(base_dir), listing_id, base_dir)
+    return to_response(delete_listing_by_id(listing_repository(), listing_id))
 
 
-@app.route("/listings/<int:listing_id>/calendar", methods=["GET"])
+@route("/listings/<int:listing_id>/calendar", methods=["GET"])
 def listing_calendar(listing_id: int):
-    local_listing = Listing.existing_by_id(listing_id, app.config.get("BASE_DIR", "."))
-    if not local_listing:
-        raise InvalidRequest("unable to find listing")
-    rates = {}
-    currency = local_listing.currency
-    if "currency" in request.args:
-        currency: Currency = validate_currency(request.args)
-        rates = app.rate_converter.latest_rates(currency.code)
-    return jsonify(
-        list(
-            build_calendar(
-                local_listing, rates.get(local_listing.currency.code, 1), currency.code
-            )
+    return to_response(
+        listing_calendar_request(
+            listing_repository(),
+            listing_id,
+            request.args,
+            current_app.rate_converter,
+            current_app.calendar_cache,
+        )
+    )
+
+
+@route("/calendars", methods=["GET"])
+def get_calendars():
+    return to_response(
+        calendars_request(
+            listing_repository(), request.args, current_app.rate_converter
+        )
+    )
+
+
+@route("/calendars", methods=["POST"])
+def post_calendars():
+    return to_response(
+        calendars_request(
+            listing_repository(), request.json, current_app.rate_converter
         )
     )
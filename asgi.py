@@ -0,0 +1,242 @@
+"""asyncio-native (ASGI) serving mode for the listing API.
+
+Serves the same endpoints as ``app.py`` with the same request handlers from
+``listing.api``; only the request parsing and response writing differ.
+
+    uvicorn asgi:application
+
+Handlers touch the listing store, so they run on worker threads and the event
+loop only ever awaits them. Exchange rates are refreshed by an
+``AsyncRateRefresher`` task instead of a thread when ``RATES_REFRESH_SECONDS``
+is configured.
+"""
+
+import asyncio
+import re
+import time
+from itertools import islice
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from app import (
+    app,
+    error_reply,
+    listing_repository,
+    markets_request,
+    metrics_request,
+    rates_status_request,
+)
+from invalid import InvalidRequest
+from listing.api import (
+    bulk_create_listings,
+    calendars_request,
+    create_new_listing,
+    delete_listing_by_id,
+    export_listings,
+    listing_by_id,
+    listing_calendar_request,
+    listing_get_request,
+    update_existing_listing,
+)
+from metrics import REQUEST_SECONDS
+from open_exchange import AsyncRateRefresher
+from reply import Reply, json_reply, loads
+
+STREAM_BATCH = 512
+
+
+class AsgiRequest:
+    def __init__(self, scope: dict, body: bytes, path_args: Dict[str, int]):
+        self.method = scope["method"]
+        self.path_args = path_args
+        self.body = body
+        headers = dict(scope.get("headers", []))
+        content_type = headers.get(b"content-type", b"").decode("latin-1")
+        self.mimetype = content_type.split(";")[0].strip().lower()
+        self.args: Dict[str, str] = {}
+        for key, value in parse_qsl(
+            scope.get("query_string", b"").decode(), keep_blank_values=True
+        ):
+            self.args.setdefault(key, value)
+
+    @property
+    def json(self):
+        try:
+            return loads(self.body or b"null")
+        except ValueError:
+            raise InvalidRequest("unable to parse request body", status_code=400)
+
+
+Handler = Callable[[AsgiRequest], Reply]
+
+routes: List[Tuple[str, "re.Pattern", Handler]] = []
+
+
+def route(method: str, path: str):
+    pattern = re.compile(re.sub(r"<int:(\w+)>", r"(?P<\1>\\d+)", path) + "$")
+
+    def register(handler: Handler):
+        routes.append((method, pattern, handler))
+        return handler
+
+    return register
+
+
+@route("GET", "/markets")
+def markets(request: AsgiRequest):
+    return markets_request()
+
+
+@route("GET", "/rates/status")
+def rates_status(request: AsgiRequest):
+    return rates_status_request(app.rate_converter)
+
+
+@route("GET", "/metrics")
+def get_metrics(request: AsgiRequest):
+    return metrics_request()
+
+
+@route("GET", "/listings")
+def get_listings(request: AsgiRequest):
+    return listing_get_request(request.args, listing_repository(), app.rate_converter)
+
+
+@route("POST", "/listings")
+def post_listings(request: AsgiRequest):
+    return create_new_listing(listing_repository(), request.json)
+
+
+@route("POST", "/listings/bulk")
+def post_listings_bulk(request: AsgiRequest):
+    return bulk_create_listings(listing_repository(), request.body, request.mimetype)
+
+
+@route("GET", "/listings/export")
+def export(request: AsgiRequest):
+    return export_listings(listing_repository())
+
+
+@route("GET", "/listings/<int:listing_id>")
+def get_listing(request: AsgiRequest):
+    return listing_by_id(listing_repository(), request.path_args["listing_id"])
+
+
+@route("PUT", "/listings/<int:listing_id>")
+def put_listing(request: AsgiRequest):
+    return update_existing_listing(
+        listing_repository(), request.path_args["listing_id"], request.json
+    )
+
+
+@route("DELETE", "/listings/<int:listing_id>")
+def delete_listing(request: AsgiRequest):
+    return delete_listing_by_id(listing_repository(), request.path_args["listing_id"])
+
+
+@route("GET", "/listings/<int:listing_id>/calendar")
+def listing_calendar(request: AsgiRequest):
+    return listing_calendar_request(
+        listing_repository(),
+        request.path_args["listing_id"],
+        request.args,
+        app.rate_converter,
+        app.calendar_cache,
+    )
+
+
+@route("GET", "/calendars")
+def get_calendars(request: AsgiRequest):
+    return calendars_request(listing_repository(), request.args, app.rate_converter)
+
+
+@route("POST", "/calendars")
+def post_calendars(request: AsgiRequest):
+    return calendars_request(listing_repository(), request.json, app.rate_converter)
+
+
+def resolve(method: str, path: str) -> Tuple[Optional[Handler], Dict[str, int], int]:
+    allowed = False
+    for route_method, pattern, handler in routes:
+        if match := pattern.match(path):
+            if route_method == method:
+                return handler, {k: int(v) for k, v in match.groupdict().items()}, 200
+            allowed = True
+    return None, {}, 405 if allowed else 404
+
+
+def dispatch(handler: Handler, request: AsgiRequest) -> Reply:
+    started = time.perf_counter()
+    try:
+        with app.app_context():
+            return handler(request)
+    except InvalidRequest as error:
+        return error_reply(error)
+    finally:
+        REQUEST_SECONDS.labels(handler.__name__).observe(time.perf_counter() - started)
+
+
+async def read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def send_reply(send, reply: Reply):
+    content_type = reply.mimetype
+    if content_type.startswith("text/"):
+        content_type += "; charset=utf-8"
+    headers = [(b"content-type", content_type.encode())]
+    headers += [(k.lower().encode(), v.encode()) for k, v in reply.headers.items()]
+    start = {"type": "http.response.start", "status": reply.status, "headers": headers}
+    if not reply.streamed:
+        body = reply.body.encode() if isinstance(reply.body, str) else reply.body
+        headers.append((b"content-length", str(len(body)).encode()))
+        await send(start)
+        await send({"type": "http.response.body", "body": body})
+        return
+    await send(start)
+    chunks = iter(reply.body)
+    while batch := await asyncio.to_thread(list, islice(chunks, STREAM_BATCH)):
+        body = "".join(batch).encode()
+        await send({"type": "http.response.body", "body": body, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def lifespan(receive, send):
+    refresher = None
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            converter = app.rate_converter
+            if converter.refresher is not None:
+                # the event loop takes over from the refresher thread
+                converter.refresher.stop()
+                converter.refresher = None
+                refresher = AsyncRateRefresher(
+                    converter.client, app.config["RATES_REFRESH_SECONDS"]
+                )
+                refresher.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if refresher is not None:
+                await refresher.stop()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    body = await read_body(receive)
+    handler, path_args, status = resolve(scope["method"], scope["path"])
+    if handler is None:
+        message = "method not allowed" if status == 405 else "not found"
+        reply = json_reply({"message": message}, status=status)
+    else:
+        request = AsgiRequest(scope, body, path_args)
+        reply = await asyncio.to_thread(dispatch, handler, request)
+    await send_reply(send, reply)
@@ -0,0 +1,71 @@
+"""Time a bulk NDJSON import against the same listings POSTed one at a time.
+
+python -m benchmarks.bulk_import --size 100000
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from app import app
+from calendar_cache import CalendarCache
+from open_exchange import get_rate_converter
+
+from benchmarks.catalog import synthetic_listings
+
+
+def rows(size: int):
+    return [
+        {
+            "title": x.title,
+            "base_price": x.base_price,
+            "currency": x.currency.code,
+            "market": x.market.code,
+        }
+        for x in synthetic_listings(size)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--single", type=int, default=1000)
+    args = parser.parse_args()
+
+    app.config["TESTING"] = True
+    app.rate_converter = get_rate_converter(True)
+    app.calendar_cache = CalendarCache()
+    client = app.test_client()
+    data = rows(args.size)
+    with tempfile.TemporaryDirectory() as base_dir:
+        app.config["BASE_DIR"] = Path(base_dir)
+        start = time.perf_counter()
+        for row in data[: args.single]:
+            client.post("/listings", json=row)
+        single = (time.perf_counter() - start) / args.single
+    with tempfile.TemporaryDirectory() as base_dir:
+        app.config["BASE_DIR"] = Path(base_dir)
+        body = "".join(json.dumps(row) + "\n" for row in data)
+        start = time.perf_counter()
+        resp = client.post(
+            "/listings/bulk", data=body, content_type="application/x-ndjson"
+        )
+        bulk = time.perf_counter() - start
+        assert len(resp.json["created"]) == args.size
+        start = time.perf_counter()
+        exported = client.get("/listings/export").data.count(b"\n")
+        export = time.perf_counter() - start
+        assert exported == args.size
+    print(f"listings: {args.size}")
+    print(
+        f"POST /listings:      {single * 1000:.2f}ms each,"
+        f" {single * args.size:.1f}s total"
+    )
+    print(f"POST /listings/bulk: {bulk:.2f}s ({single * args.size / bulk:.0f}x)")
+    print(f"GET /listings/export: {export:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
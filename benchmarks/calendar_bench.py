@@ -0,0 +1,84 @@
+"""Compare per-request calendar cost against building every day from scratch,
+and monthly summaries in closed form against summing the daily rows.
+
+    python -m benchmarks.calendar_bench --requests 2000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from calendar_api import (
+    build_calendar,
+    build_calendar_summary,
+    calendar_lookup,
+    default_calendar,
+    periods,
+)
+
+from benchmarks.catalog import synthetic_listings
+
+
+def per_day_calendar(listing, currency_factor, code):
+    calendar_multiplier = calendar_lookup.get(listing.market.code, default_calendar)
+    start = datetime.now().date()
+    for day in range(365):
+        dt = start + timedelta(days=day)
+        yield {
+            "date": dt.isoformat(),
+            "price": (listing.base_price * calendar_multiplier(dt)) / currency_factor,
+            "currency": code,
+        }
+
+
+def monthly_from_rows(listing, currency_factor, code):
+    start = datetime.now().date()
+    rows = list(build_calendar(listing, currency_factor, code, start))
+    offset = 0
+    for period_start, days in periods(start, len(rows), "month"):
+        prices = [row["price"] for row in rows[offset : offset + days]]
+        offset += days
+        yield min(prices), max(prices), sum(prices) / days
+
+
+def monthly_closed_form(listing, currency_factor, code):
+    start = datetime.now().date()
+    for row in build_calendar_summary(
+        listing, currency_factor, code, start, 365, "month"
+    ):
+        yield row["min"], row["max"], row["mean"]
+
+
+def timed(func, listings, currency_factor=0.94, code="EUR"):
+    start = time.perf_counter()
+    for listing in listings:
+        result = list(func(listing, currency_factor, code))
+    return (time.perf_counter() - start) / len(listings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    listings = synthetic_listings(args.requests)
+    before, expected = timed(per_day_calendar, listings)
+    after, actual = timed(build_calendar, listings)
+    assert actual == expected, "both calendars must match"
+    print(f"requests: {args.requests}")
+    print(f"per-day computation: {before * 1e6:.0f}us per calendar")
+    print(
+        f"cached tables:       {after * 1e6:.0f}us per calendar"
+        f" ({before / after:.1f}x)"
+    )
+    before, _ = timed(monthly_from_rows, listings)
+    after, _ = timed(monthly_closed_form, listings)
+    print(f"monthly from rows:   {before * 1e6:.0f}us per calendar")
+    print(
+        f"monthly closed form: {after * 1e6:.0f}us per calendar"
+        f" ({before / after:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Compare one bulk /calendars request with one calendar request per listing.
+
+python -m benchmarks.calendars --size 10000 --ids 1000
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from app import app
+from calendar_cache import CalendarCache
+from listing.model import Listing
+from open_exchange import get_rate_converter
+
+from benchmarks.catalog import synthetic_listings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--ids", type=int, default=1000)
+    args = parser.parse_args()
+
+    app.config["TESTING"] = True
+    app.rate_converter = get_rate_converter(True)
+    # no response cache, so both sides build every calendar
+    app.calendar_cache = CalendarCache(budget=0)
+    client = app.test_client()
+    ids = list(range(1, args.ids + 1))
+    with tempfile.TemporaryDirectory() as base_dir:
+        app.config["BASE_DIR"] = Path(base_dir)
+        Listing.write_to_file(synthetic_listings(args.size), base_dir)
+        client.get("/listings/1")
+
+        start = time.perf_counter()
+        singles = [
+            client.get(f"/listings/{_id}/calendar?currency=EUR").get_data()
+            for _id in ids
+        ]
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        resp = client.post("/calendars", json={"ids": ids, "currency": "EUR"})
+        body = resp.get_data()
+        bulk = time.perf_counter() - start
+    calendars = [item["calendar"] for item in json.loads(body)]
+    assert calendars == [json.loads(single) for single in singles]
+    print(f"listings: {args.size}, calendars: {args.ids}")
+    print(f"one request per listing: {single:.2f}s")
+    print(f"POST /calendars:         {bulk:.2f}s ({single / bulk:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import random
+from typing import List
+
+from currencies import Currencies
+from listing.model import Listing
+from markets import Markets
+
+
+def synthetic_listings(size: int, seed: int = 0) -> List[Listing]:
+    """``size`` listings spread over every market, priced in the market currency."""
+    rng = random.Random(seed)
+    markets = Markets.get_all()
+    return [
+        Listing(
+            id=_id,
+            title=f"synthetic listing {_id}",
+            base_price=float(rng.randint(10, 1000)),
+            currency=Currencies.get_by_code(market.currency),
+            market=market,
+        )
+        for _id, market in enumerate(
+            (markets[i % len(markets)] for i in range(size)), start=1
+        )
+    ]
@@ -0,0 +1,79 @@
+"""Compare base_price filtering against the old one-conversion-per-listing loop.
+
+python -m benchmarks.filter_listings --size 1000000
+"""
+
+import argparse
+import time
+
+from listing.api import base_price_filter_lkp, base_price_filters, filter_listings
+from listing.columnar import ListingColumns, np
+from open_exchange import convert_rate
+
+from benchmarks.catalog import synthetic_listings
+
+RATES = {"USD": 1, "EUR": 0.94, "JPY": 149.5, "ILS": 3.8, "AUD": 1.57}
+PARAMS = {"base_price.gte": "100", "base_price.lt": "500", "currency": "EUR"}
+
+
+class StubRateConverter:
+    def latest_rates(self, base_code: str):
+        return convert_rate(RATES, base_code)
+
+
+def per_listing_filter(listings, rates, base_code, price_func, price):
+    for listing in listings:
+        rate = convert_rate(rates, base_code)
+        converted_price = price * rate.get(listing.currency.code, 1)
+        if price_func(listing, converted_price):
+            yield listing
+
+
+def per_listing_pipeline(listings, params, rate_converter):
+    rates = rate_converter.latest_rates(params["currency"])
+    for key, value in params.items():
+        if key.startswith("base_price"):
+            price_func = base_price_filter_lkp[key.split(".")[-1]]
+            listings = per_listing_filter(
+                listings, rates, params["currency"], price_func, float(value)
+            )
+    return listings
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = [x.id for x in func(*args)]
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    listings = synthetic_listings(args.size)
+    rate_converter = StubRateConverter()
+    before, expected = timed(per_listing_pipeline, listings, PARAMS, rate_converter)
+    after, actual = timed(filter_listings, listings, PARAMS, rate_converter)
+    assert actual == expected, "both pipelines must return the same listings"
+    print(f"listings: {args.size}, matched: {len(actual)}")
+    print(f"per-listing conversion: {before:.3f}s")
+    print(f"per-query thresholds:   {after:.3f}s ({before / after:.1f}x)")
+    if np is None:
+        print("numpy not installed, skipping the columnar backend")
+        return
+    columns = ListingColumns.build(listings)
+    rates = rate_converter.latest_rates(PARAMS["currency"])
+    price_filters = base_price_filters(PARAMS)
+    runs = []
+    for _ in range(5):
+        start = time.perf_counter()
+        vectorized = columns.query(None, price_filters, rates)
+        runs.append(time.perf_counter() - start)
+    assert vectorized.tolist() == expected, "columnar backend must match"
+    columnar = min(runs)
+    print(f"numpy columns:          {columnar * 1000:.1f}ms ({before / columnar:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
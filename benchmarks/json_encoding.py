@@ -0,0 +1,64 @@
+"""Compare response encoding: dataclasses.asdict + stdlib json vs reply.dumpb.
+
+python -m benchmarks.json_encoding --size 1000
+"""
+
+import argparse
+import dataclasses
+import json
+import time
+
+from calendar_api import build_calendar
+from reply import default, dumpb, orjson
+
+from benchmarks.catalog import synthetic_listings
+
+
+def stdlib_encode(payload) -> bytes:
+    return json.dumps(
+        payload,
+        default=default,
+        ensure_ascii=True,
+        sort_keys=True,
+        separators=(",", ":"),
+    ).encode()
+
+
+def timed(func, *args, runs: int = 20):
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def compare(name: str, before, after, items):
+    before_time, expected = timed(before, items)
+    after_time, actual = timed(after, items)
+    assert actual == expected, f"{name}: output must be byte-identical"
+    print(
+        f"{name:10} before {before_time * 1000:7.2f}ms"
+        f"  after {after_time * 1000:7.2f}ms ({before_time / after_time:.1f}x)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1000)
+    args = parser.parse_args()
+
+    listings = synthetic_listings(args.size)
+    calendar = list(build_calendar(listings[1], 0.94, "EUR"))
+    print(f"encoder: {'orjson' if orjson is not None else 'stdlib'}")
+    compare(
+        "listings",
+        lambda items: stdlib_encode([dataclasses.asdict(x) for x in items]),
+        lambda items: dumpb([x.to_dict() for x in items]),
+        listings,
+    )
+    compare("calendar", stdlib_encode, dumpb, calendar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Load test the threaded Flask server against the ASGI app under uvicorn.
+
+    python -m benchmarks.load_test --concurrency 64 --duration 10
+
+Both servers run the same handlers on the same synthetic catalog; the load
+generator is an ``httpx.AsyncClient`` keeping ``--concurrency`` requests in
+flight and reporting throughput and latency percentiles per server.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from listing.model import Listing
+
+from benchmarks.catalog import synthetic_listings
+
+URLS = [
+    "/listings?limit=50",
+    "/listings?market=paris&base_price.lt=300&currency=USD&limit=50",
+    "/listings/1",
+    "/listings/2/calendar",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_commands(port: int):
+    return {
+        "werkzeug (threaded)": [
+            sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(port),
+        ],
+        "uvicorn (asgi)": [
+            sys.executable, "-m", "uvicorn", "asgi:application",
+            "--port", str(port), "--log-level", "warning",
+        ],
+    }  # fmt: skip
+
+
+async def wait_until_up(url: str, timeout: float = 15):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.monotonic() < deadline:
+            try:
+                await http.get(f"{url}/markets")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+async def generate_load(url: str, concurrency: int, duration: float):
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as http:
+        deadline = time.monotonic() + duration
+
+        async def worker(offset: int):
+            nonlocal errors
+            i = offset
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                resp = await http.get(URLS[i % len(URLS)])
+                latencies.append(time.perf_counter() - start)
+                errors += resp.status_code != 200
+                i += 1
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return latencies, errors
+
+
+def report(name: str, latencies, errors: int, duration: float):
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:20} {len(latencies) / duration:8.0f} req/s"
+        f"  p50 {percentiles[49] * 1000:6.1f}ms  p99 {percentiles[98] * 1000:6.1f}ms"
+        f"  errors {errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        Listing.extend(synthetic_listings(args.size), Path(base_dir))
+        env = {
+            **os.environ,
+            "LISTING_API_BASE_DIR": base_dir,
+            "LISTING_API_TESTING": "true",
+        }
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        print(f"listings: {args.size}, concurrency: {args.concurrency}")
+        for name, command in server_commands(port).items():
+            server = subprocess.Popen(command, env=env, stderr=subprocess.DEVNULL)
+            try:
+                asyncio.run(wait_until_up(url))
+                latencies, errors = asyncio.run(
+                    generate_load(url, args.concurrency, args.duration)
+                )
+            finally:
+                server.terminate()
+                server.wait()
+            report(name, latencies, errors, args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Bytes held per in-memory listing, before and after slots and interning.
+
+    python -m benchmarks.memory --size 100000
+
+"before" rebuilds the previous representation: plain dataclasses with a fresh
+``Market`` and ``Currency`` per listing, as ``Listing.from_dict`` used to do.
+"""
+
+import argparse
+import gc
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+from listing.model import Listing
+
+from benchmarks.catalog import synthetic_listings
+
+
+@dataclass
+class DictMarket:
+    code: str
+    name: str
+    currency: str
+
+
+@dataclass
+class DictCurrency:
+    code: str
+    name: str
+    symbol: str
+
+
+@dataclass
+class DictListing:
+    id: int
+    title: str
+    base_price: float
+    currency: DictCurrency
+    market: DictMarket
+    host_name: Optional[str] = None
+
+
+def load_before(rows):
+    return [
+        DictListing(
+            **{
+                **row,
+                "market": DictMarket(**row["market"]),
+                "currency": DictCurrency(**row["currency"]),
+            }
+        )
+        for row in rows
+    ]
+
+
+def load_after(rows):
+    return [Listing.from_dict(row) for row in rows]
+
+
+def measure(load, rows) -> int:
+    gc.collect()
+    tracemalloc.start()
+    listings = load(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(listings) == len(rows)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rows = [x.to_dict() for x in synthetic_listings(args.size)]
+    before = measure(load_before, rows) / args.size
+    after = measure(load_after, rows) / args.size
+    print(f"listings: {args.size}")
+    print(f"dataclass + copies: {before:6.0f} bytes/listing")
+    print(
+        f"slots + interned:   {after:6.0f} bytes/listing ({before / after:.1f}x less)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Compare the JSON listing snapshot with the binary one: size and load time.
+
+python -m benchmarks.snapshot --size 200000
+"""
+
+import argparse
+import json
+import time
+
+from listing import snapshot
+from listing.model import Listing
+
+from benchmarks.catalog import synthetic_listings
+
+
+def timed(func, *args):
+    runs = []
+    for _ in range(3):
+        start = time.perf_counter()
+        result = func(*args)
+        runs.append(time.perf_counter() - start)
+    return min(runs), result
+
+
+def load_json(data: bytes):
+    return [Listing.from_dict(x) for x in json.loads(data)]
+
+
+def load_binary(data: bytes):
+    return [Listing.from_dict(x) for x in snapshot.loads(data)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200_000)
+    args = parser.parse_args()
+
+    listings = synthetic_listings(args.size)
+    legacy = json.dumps([x.to_dict() for x in listings]).encode()
+    binary = snapshot.dumps(x.to_record() for x in listings)
+    before, from_json = timed(load_json, legacy)
+    after, from_binary = timed(load_binary, binary)
+    assert from_json == from_binary == listings, "both formats must round trip"
+    print(f"listings: {args.size}")
+    print(f"json:   {len(legacy) / 1e6:7.1f}MB  load {before:.3f}s")
+    print(
+        f"binary: {len(binary) / 1e6:7.1f}MB  load {after:.3f}s"
+        f" ({len(legacy) / len(binary):.1f}x smaller, {before / after:.1f}x faster)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Track cold start cost: importing ``app``, ``create_app`` and the first request.
+
+Every sample runs in a fresh interpreter. The import is measured with
+``python -X importtime``, which also names the modules that cost the most:
+
+    python -m benchmarks.startup --runs 5 --output startup.json
+
+Results use the ``benchmarks.suite`` format, so ``--baseline`` fails the run
+on a regression the same way.
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from listing.model import Listing
+
+from benchmarks.catalog import synthetic_listings
+from benchmarks.suite import DEFAULT_THRESHOLD, compare
+
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+FIRST_REQUEST = """
+import time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({"TESTING": True, "BASE_DIR": %r})
+created = time.perf_counter()
+assert app.test_client().get("/listings/1").status_code == 200
+print(imported - started, created - imported, time.perf_counter() - created)
+"""
+
+
+def importtime(module: str) -> Dict[str, tuple]:
+    """``(self_us, cumulative_us)`` per module imported by ``import module``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if match := IMPORTTIME.match(line):
+            modules[match[4]] = (int(match[1]), int(match[2]))
+    return modules
+
+
+def first_request(base_dir: Path) -> List[float]:
+    proc = subprocess.run(
+        [sys.executable, "-c", FIRST_REQUEST % str(base_dir)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return [float(value) for value in proc.stdout.split()]
+
+
+def summary(samples: List[float]) -> dict:
+    return {
+        "repeat": len(samples),
+        "median_us": statistics.median(samples),
+        "max_us": max(samples),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--size", type=int, default=10_000, help="catalog size")
+    parser.add_argument("--top", type=int, default=10, help="modules to list")
+    parser.add_argument("--output", type=Path, help="write results JSON here")
+    parser.add_argument("--baseline", type=Path, help="results JSON to compare to")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    samples = defaultdict(list)
+    self_times = defaultdict(list)
+    with tempfile.TemporaryDirectory() as base_dir:
+        Listing.write_to_file(synthetic_listings(args.size), base_dir)
+        for _ in range(args.runs):
+            modules = importtime("app")
+            samples["import_app"].append(modules["app"][1])
+            for name, (self_us, _) in modules.items():
+                self_times[name].append(self_us)
+            timings = first_request(Path(base_dir))
+            for key, seconds in zip(("_", "create_app", "first_request"), timings):
+                samples[key].append(seconds * 1e6)
+    del samples["_"]
+
+    results = {key: summary(values) for key, values in samples.items()}
+    for key, result in results.items():
+        print(f"{key:16} {result['median_us'] / 1000:8.1f}ms")
+    print(f"slowest modules to import (self time, median of {args.runs}):")
+    slowest = sorted(
+        self_times, key=lambda name: statistics.median(self_times[name]), reverse=True
+    )
+    for name in slowest[: args.top]:
+        print(f"  {name:40} {statistics.median(self_times[name]) / 1000:8.1f}ms")
+
+    current = {"python": sys.version.split()[0], "created_at": time.time()}
+    current["results"] = {f"{key}@startup": value for key, value in results.items()}
+    if args.output:
+        args.output.write_text(json.dumps(current, indent=2, sort_keys=True))
+    if not args.baseline:
+        return 0
+    baseline = json.loads(args.baseline.read_text())
+    if regressions := compare(baseline, current, args.threshold):
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}:")
+        print("\n".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""Benchmark suite for the listing API hot paths.
+
+Every case runs through the Flask test client against a synthetic catalog
+spread over all markets and a stub ``RateConverter`` with fixed rates:
+
+    python -m benchmarks.suite --sizes 1000,100000 --output results.json
+
+Results are written as JSON. Given a ``--baseline`` from an earlier run, the
+suite exits non-zero when any case got slower by more than ``--threshold``
+(a fraction of the baseline median). Two result files can also be compared
+without running anything:
+
+    python -m benchmarks.suite --compare baseline.json results.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from app import app
+from calendar_cache import CalendarCache
+from listing.model import Listing
+from markets import Markets
+from open_exchange import RateConverter, RatesSnapshot
+
+from benchmarks.catalog import synthetic_listings
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_THRESHOLD = 0.25
+
+RATES = {"USD": 1, "EUR": 0.94, "JPY": 149.5, "ILS": 3.8, "AUD": 1.57}
+
+
+class StubRateConverter(RateConverter):
+    """Fixed rates, never calling upstream."""
+
+    def __init__(self):
+        super().__init__(testing=False)
+        self._snapshot = RatesSnapshot.from_usd(RATES, fetched_at=0, id=1)
+
+    def snapshot(self) -> RatesSnapshot:
+        return self._snapshot
+
+
+@dataclass
+class Context:
+    client: object
+    size: int
+    rng: random.Random
+    base_dir: Path
+    created: List[int]
+
+
+Case = Callable[[Context], Callable[[], object]]
+
+cases: Dict[str, Case] = {}
+repeats: Dict[str, int] = {}
+
+
+def case(name: str, repeat: int = 200):
+    def register(func: Case) -> Case:
+        cases[name] = func
+        repeats[name] = repeat
+        return func
+
+    return register
+
+
+def expect_ok(resp):
+    assert resp.status_code == 200, resp.data
+    return resp
+
+
+@case("point_read")
+def point_read(ctx: Context):
+    def run():
+        return expect_ok(ctx.client.get(f"/listings/{ctx.rng.randint(1, ctx.size)}"))
+
+    return run
+
+
+@case("filtered_scan", repeat=50)
+def filtered_scan(ctx: Context):
+    url = (
+        "/listings?market=paris&base_price.gte=100&base_price.lt=500"
+        "&currency=USD&limit=100"
+    )
+    return lambda: expect_ok(ctx.client.get(url))
+
+
+@case("calendar_build")
+def calendar_build(ctx: Context):
+    def run():
+        url = f"/listings/{ctx.rng.randint(1, ctx.size)}/calendar?currency=EUR"
+        return expect_ok(ctx.client.get(url))
+
+    return run
+
+
+@case("create")
+def create(ctx: Context):
+    market = Markets.get_all()[0]
+    data = {
+        "title": "benchmark",
+        "base_price": 100,
+        "currency": market.currency,
+        "market": market.code,
+    }
+
+    def run():
+        resp = expect_ok(ctx.client.post("/listings", json=data))
+        ctx.created.append(resp.json["id"])
+
+    return run
+
+
+@case("update")
+def update(ctx: Context):
+    def run():
+        listing_id = ctx.rng.randint(1, ctx.size)
+        data = {"base_price": ctx.rng.randint(10, 1000)}
+        return expect_ok(ctx.client.put(f"/listings/{listing_id}", json=data))
+
+    return run
+
+
+@case("delete")
+def delete(ctx: Context):
+    return lambda: expect_ok(ctx.client.delete(f"/listings/{ctx.created.pop()}"))
+
+
+@case("rate_conversion", repeat=1000)
+def rate_conversion(ctx: Context):
+    # the full base currency matrix a converter builds on every refresh
+    return lambda: RatesSnapshot.from_usd(RATES, fetched_at=0)
+
+
+@case("write_to_file", repeat=3)
+def write_to_file(ctx: Context):
+    listings = list(Listing.existing(ctx.base_dir))
+    return lambda: Listing.write_to_file(listings, ctx.base_dir)
+
+
+def measure(func: Callable[[], object], repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "repeat": repeat,
+        "median_us": statistics.median(timings) * 1e6,
+        "p95_us": timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1e6,
+    }
+
+
+def run_suite(
+    sizes, selected: Optional[List[str]] = None, scale: float = 1.0
+) -> Dict[str, dict]:
+    """Results keyed ``case@size``; ``scale`` multiplies every repeat count."""
+    app.config["TESTING"] = True
+    app.rate_converter = StubRateConverter()
+    client = app.test_client()
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as base_dir:
+            base_dir = Path(base_dir)
+            app.config["BASE_DIR"] = base_dir
+            # calendars are built on every request rather than served cached
+            app.calendar_cache = CalendarCache(budget=0)
+            Listing.write_to_file(synthetic_listings(size), base_dir)
+            ctx = Context(client, size, random.Random(size), base_dir, [])
+            expect_ok(client.get("/listings/1"))
+            for name, make in cases.items():
+                if selected and name not in selected:
+                    continue
+                repeat = max(1, int(repeats[name] * scale))
+                if name == "delete":
+                    repeat = min(repeat, len(ctx.created))
+                    if not repeat:
+                        continue
+                result = results[f"{name}@{size}"] = measure(make(ctx), repeat)
+                print(f"{name:16} {size:>9}  {result['median_us']:10.1f}us")
+    return results
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """Cases whose median grew by more than ``threshold``, as report lines."""
+    regressions = []
+    for key, result in current["results"].items():
+        if (before := baseline["results"].get(key)) is None:
+            continue
+        ratio = result["median_us"] / before["median_us"]
+        line = (
+            f"{key:28} {before['median_us']:10.1f}us"
+            f" -> {result['median_us']:10.1f}us  ({ratio:.2f}x)"
+        )
+        print(line)
+        if ratio > 1 + threshold:
+            regressions.append(line)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="catalog sizes"
+    )
+    parser.add_argument("--cases", help="comma separated subset of " + ", ".join(cases))
+    parser.add_argument("--scale", type=float, default=1.0, help="repeat multiplier")
+    parser.add_argument("--output", type=Path, help="write results JSON here")
+    parser.add_argument("--baseline", type=Path, help="results JSON to compare to")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument(
+        "--compare", nargs=2, type=Path, metavar=("BASELINE", "RESULTS")
+    )
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        baseline, current = (json.loads(path.read_text()) for path in args.compare)
+    else:
+        sizes = [int(size) for size in args.sizes.split(",")]
+        selected = args.cases.split(",") if args.cases else None
+        current = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": time.time(),
+            "results": run_suite(sizes, selected, args.scale),
+        }
+        if args.output:
+            args.output.write_text(json.dumps(current, indent=2, sort_keys=True))
+        if not args.baseline:
+            return 0
+        baseline = json.loads(args.baseline.read_text())
+    if regressions := compare(baseline, current, args.threshold):
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}:")
+        print("\n".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Memory of N worker processes reading one catalog, per repository mode.
+
+    python -m benchmarks.workers --size 200000 --workers 1,2,4,8
+
+Each worker loads the catalog, runs a filtered query and reports its
+proportional set size (Linux ``smaps_rollup``), where pages shared between
+processes are split among them. "private" is ``ListingRepository``, which keeps
+its own listings per process; "shared" is ``SharedListingRepository``, mapping
+one published file in every worker.
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+from pathlib import Path
+
+from listing.model import Listing
+from listing.repository import ListingRepository
+from listing.shared import SharedListingRepository
+from listing.store import ListingStore
+
+from benchmarks.catalog import synthetic_listings
+
+MODES = {"private": ListingRepository, "shared": SharedListingRepository}
+
+
+def pss_kib() -> int:
+    with open("/proc/self/smaps_rollup") as fp:
+        for line in fp:
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+    raise RuntimeError("no Pss in smaps_rollup")
+
+
+def worker(mode, base_dir, ready, go, results):
+    baseline = pss_kib()
+    repository = MODES[mode](ListingStore(base_dir))
+    assert len(repository.query({"paris"}, [("gte", 100.0)], {})) > 0
+    ready.wait()
+    # every worker is loaded now, so shared pages are split between all of them
+    go.wait()
+    results.put(pss_kib() - baseline)
+
+
+def run(mode: str, base_dir: str, workers: int) -> int:
+    """Total KiB the workers grew by after loading the catalog."""
+    context = multiprocessing.get_context("spawn")
+    ready, go = context.Barrier(workers + 1), context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(mode, base_dir, ready, go, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    ready.wait()
+    go.wait()
+    total = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--workers", default="1,2,4,8")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        Listing.write_to_file(synthetic_listings(args.size), base_dir)
+        # publish once up front so no worker pays for it while measured
+        SharedListingRepository(ListingStore(Path(base_dir))).refresh()
+        print(f"listings: {args.size}")
+        for workers in map(int, args.workers.split(",")):
+            line = f"workers {workers:3}:"
+            for mode in MODES:
+                total = run(mode, base_dir, workers) / 1024
+                line += f"  {mode} {total:7.1f}MiB ({total / workers:6.1f}MiB each)"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
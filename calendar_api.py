@@ -1,4 +1,7 @@
+from collections import Counter
 from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 
 from listing.model import Listing
 from markets import Markets
@@ -29,13 +32,185 @@ calendar_lookup = {
 }
 
 
-def build_calendar(listing: Listing, currency_factor: float, code: str):
+CALENDAR_DAYS = 365
+
+
+class CalendarTable(NamedTuple):
+    dates: Tuple[str, ...]
+    multipliers: Tuple[float, ...]
+    distinct_multipliers: Tuple[float, ...]
+
+
+@lru_cache(maxsize=32)
+def calendar_table(
+    calendar_multiplier: Callable[[date], float],
+    start: date,
+    days: int = CALENDAR_DAYS,
+) -> CalendarTable:
+    """Date strings and multipliers of a market rule, computed once per start day."""
+    dts = [start + timedelta(days=day) for day in range(days)]
+    multipliers = tuple(calendar_multiplier(dt) for dt in dts)
+    return CalendarTable(
+        tuple(dt.isoformat() for dt in dts),
+        multipliers,
+        tuple(set(multipliers)),
+    )
+
+
+def build_calendar(
+    listing: Listing,
+    currency_factor: float,
+    code: str,
+    start: Optional[date] = None,
+    currency_factors: Optional[Sequence[float]] = None,
+    days: int = CALENDAR_DAYS,
+):
+    """``days`` calendar rows starting today, or at ``start``.
+
+    ``currency_factors`` replaces ``currency_factor`` with one factor per day,
+    e.g. from ``RateHistory.currency_factors``.
+    """
+    calendar_multiplier = calendar_lookup.get(listing.market.code, default_calendar)
+    # keyed on today's date so the cached table rolls over at midnight
+    table = calendar_table(calendar_multiplier, start or datetime.now().date(), days)
+    if currency_factors is not None:
+        for dt, multiplier, factor in zip(
+            table.dates, table.multipliers, currency_factors
+        ):
+            yield {
+                "date": dt,
+                "price": (listing.base_price * multiplier) / factor,
+                "currency": code,
+            }
+        return
+    prices = {
+        multiplier: (listing.base_price * multiplier) / currency_factor
+        for multiplier in table.distinct_multipliers
+    }
+    for dt, multiplier in zip(table.dates, table.multipliers):
+        yield {"date": dt, "price": prices[multiplier], "currency": code}
+
+
+GRANULARITIES = ("day", "week", "month")
+
+# any Monday; the market rules only look at the weekday
+REFERENCE_MONDAY = date(2024, 1, 1)
+
+
+@lru_cache(maxsize=None)
+def weekday_multipliers(calendar_multiplier: Callable[[date], float]):
+    """Multiplier of a market rule per weekday, Monday first."""
+    return tuple(
+        calendar_multiplier(REFERENCE_MONDAY + timedelta(days=day)) for day in range(7)
+    )
+
+
+def weekday_counts(start: date, days: int) -> List[int]:
+    """How often each weekday, Monday first, occurs in ``days`` from ``start``."""
+    counts = [days // 7] * 7
+    for offset in range(days % 7):
+        counts[(start.weekday() + offset) % 7] += 1
+    return counts
+
+
+def periods(start: date, days: int, granularity: str) -> Iterator[Tuple[date, int]]:
+    """First day and length of each week (Monday to Sunday) or month in range."""
+    end = start + timedelta(days=days)
+    while start < end:
+        if granularity == "week":
+            next_start = start + timedelta(days=7 - start.weekday())
+        elif start.month == 12:
+            next_start = date(start.year + 1, 1, 1)
+        else:
+            next_start = date(start.year, start.month + 1, 1)
+        next_start = min(next_start, end)
+        yield start, (next_start - start).days
+        start = next_start
+
+
+class SummaryPeriod(NamedTuple):
+    start: str
+    end: str
+    days: int
+    multiplier_days: Tuple[Tuple[float, int], ...]
+
+
+@lru_cache(maxsize=32)
+def summary_table(
+    calendar_multiplier: Callable[[date], float],
+    start: date,
+    days: int,
+    granularity: str,
+) -> Tuple[SummaryPeriod, ...]:
+    """Per period, how many days each distinct multiplier of a market rule has."""
+    pattern = weekday_multipliers(calendar_multiplier)
+    table = []
+    for period_start, period_days in periods(start, days, granularity):
+        multiplier_days = Counter()
+        for multiplier, count in zip(
+            pattern, weekday_counts(period_start, period_days)
+        ):
+            if count:
+                multiplier_days[multiplier] += count
+        table.append(
+            SummaryPeriod(
+                period_start.isoformat(),
+                (period_start + timedelta(days=period_days - 1)).isoformat(),
+                period_days,
+                tuple(multiplier_days.items()),
+            )
+        )
+    return tuple(table)
+
+
+def price_summary(period: SummaryPeriod, prices: Dict[float, int], code: str) -> dict:
+    total = sum(price * count for price, count in prices.items())
+    return {
+        "start": period.start,
+        "end": period.end,
+        "days": period.days,
+        "min": min(prices),
+        "max": max(prices),
+        "mean": total / period.days,
+        "sum": total,
+        "currency": code,
+    }
+
+
+def build_calendar_summary(
+    listing: Listing,
+    currency_factor: float,
+    code: str,
+    start: date,
+    days: int,
+    granularity: str,
+    currency_factors: Optional[Sequence[float]] = None,
+) -> Iterator[dict]:
+    """Min, max, mean and sum of the calendar prices per week or month.
+
+    With a single ``currency_factor`` each period is computed from its weekday
+    counts without building the daily rows; per-day ``currency_factors`` fall
+    back to summing the days.
+    """
     calendar_multiplier = calendar_lookup.get(listing.market.code, default_calendar)
-    start = datetime.now().date()
-    for day in range(365):
-        dt = start + timedelta(days=day)
-        yield {
-            "date": dt.isoformat(),
-            "price": (listing.base_price * calendar_multiplier(dt)) / currency_factor,
-            "currency": code,
-        }
+    table = summary_table(calendar_multiplier, start, days, granularity)
+    if currency_factors is not None:
+        multipliers = calendar_table(calendar_multiplier, start, days).multipliers
+        offset = 0
+        for period in table:
+            prices = Counter(
+                (listing.base_price * multiplier) / factor
+                for multiplier, factor in zip(
+                    multipliers[offset : offset + period.days],
+                    currency_factors[offset : offset + period.days],
+                )
+            )
+            offset += period.days
+            yield price_summary(period, prices, code)
+        return
+    for period in table:
+        prices = {}
+        for multiplier, count in period.multiplier_days:
+            price = (listing.base_price * multiplier) / currency_factor
+            prices[price] = prices.get(price, 0) + count
+        yield price_summary(period, prices, code)
@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Hashable, NamedTuple, Optional, Set
+
+DEFAULT_BUDGET = 64 * 1024 * 1024
+
+
+class CalendarKey(NamedTuple):
+    listing_id: int
+    listing_version: int
+    currency: str
+    rates_id: Hashable
+    start: date
+    days: int = 365
+    granularity: str = "day"
+
+
+class CalendarCache:
+    """LRU of encoded calendar responses, evicted by total byte size."""
+
+    def __init__(self, budget: int = DEFAULT_BUDGET):
+        self.budget = budget
+        self.size = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CalendarKey, bytes]" = OrderedDict()
+        self._by_listing: Dict[int, Set[CalendarKey]] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: CalendarKey) -> Optional[bytes]:
+        with self._lock:
+            if (body := self._entries.get(key)) is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: CalendarKey, body: bytes):
+        if len(body) > self.budget:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = body
+            self._by_listing.setdefault(key.listing_id, set()).add(key)
+            self.size += len(body)
+            while self.size > self.budget:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate(self, listing_id: int):
+        with self._lock:
+            for key in list(self._by_listing.get(listing_id, ())):
+                self._discard(key)
+
+    def _discard(self, key: CalendarKey):
+        if (body := self._entries.pop(key, None)) is None:
+            return
+        self.size -= len(body)
+        keys = self._by_listing[key.listing_id]
+        keys.discard(key)
+        if not keys:
+            del self._by_listing[key.listing_id]
@@ -1,7 +1,10 @@
+import random
+
 import pytest
 from flask.testing import FlaskClient
 
 from app import app
+from calendar_cache import CalendarCache
 from currencies import Currencies, Currency
 from listing.api import convert_request_to_new_listing
 from listing.model import Listing
@@ -14,6 +17,7 @@ def client(tmp_path) -> FlaskClient:
     app.config["BASE_DIR"] = tmp_path
     app.config["TESTING"] = True
     app.rate_converter = get_rate_converter(True)
+    app.calendar_cache = CalendarCache()
     with app.test_client() as client:
         yield client
 
@@ -77,3 +81,19 @@ def listing():
         currency=Currencies.get_by_code("USD"),
         market=Markets.get_by_code("san-francisco"),
     )
+
+
+@pytest.fixture
+def random_listings():
+    rng = random.Random(7)
+    markets = Markets.get_all()
+    return [
+        Listing(
+            id=_id,
+            title=f"listing {_id}",
+            base_price=float(rng.randint(1, 200)),
+            currency=Currencies.get_by_code(rng.choice(["USD", "EUR"])),
+            market=rng.choice(markets),
+        )
+        for _id in range(1, 301)
+    ]
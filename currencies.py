@@ -1,15 +1,17 @@
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 from enum import Enum
 
 
 @dataclass
 class Currency:
+    __slots__ = ("code", "name", "symbol")
+
     code: str
     name: str
     symbol: str
 
     def to_dict(self):
-        return asdict(self)
+        return {"code": self.code, "name": self.name, "symbol": self.symbol}
 
 
 class InvalidCurrency(Exception):
@@ -45,6 +47,13 @@ class Currencies:
     def get_all(cls):
         return cls.__ALL__
 
+    @classmethod
+    def resolve(cls, value) -> Currency:
+        """The shared instance for a code or a ``to_dict`` mapping of one."""
+        if isinstance(value, dict):
+            return cls.__PER_CODE__.get(value["code"]) or Currency(**value)
+        return cls.get_by_code(value)
+
     @classmethod
     def get_by_code(cls, code):
         if currency := cls.__PER_CODE__.get(code):
@@ -1,13 +1,29 @@
-from itertools import chain
-from typing import Dict, Iterable, List
-
+import math
+from dataclasses import replace
+from datetime import date, datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from calendar_api import (
+    CALENDAR_DAYS,
+    GRANULARITIES,
+    build_calendar,
+    build_calendar_summary,
+)
+from calendar_cache import CalendarCache, CalendarKey
 from currencies import Currencies, Currency, InvalidCurrency
-from flask import Request, jsonify
 from invalid import InvalidRequest
 from markets import InvalidMarket, Markets
+from metrics import span
 from open_exchange import RateConverter, convert_rate
+from reply import Reply, dumps, json_reply, loads
 
 from listing.model import Listing
+from listing.repository import ListingRepository
+from listing.snapshot import code_of
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+MAX_CALENDAR_IDS = 5000
 
 
 def validate_market(data: dict):
@@ -18,23 +34,39 @@ def validate_market(data: dict):
 
 
 def validate_currency(data: dict):
+    code = data.get("currency", "")
     try:
-        return Currencies.get_by_code(data.get("currency", ""))
+        if not isinstance(code, str):
+            # a JSON body can hold anything, and lists or objects are unhashable
+            raise InvalidCurrency(f"Currency with code={code} does not exist")
+        return Currencies.get_by_code(code)
     except InvalidCurrency as e:
         raise InvalidRequest(e.args[0])
 
 
 def validate_price(data: dict):
     try:
-        return float(data.get("base_price"))
-    except ValueError as e:
+        price = float(data.get("base_price"))
+    except (TypeError, ValueError) as e:
         raise InvalidRequest(e.args[0])
+    if not math.isfinite(price):
+        raise InvalidRequest("base_price must be a finite number")
+    return price
 
 
 def validate_title(data: dict):
-    if title := data.get("title"):
-        return title
-    raise InvalidRequest("must include a title")
+    if not (title := data.get("title")):
+        raise InvalidRequest("must include a title")
+    if not isinstance(title, str):
+        raise InvalidRequest("title must be a string")
+    return title
+
+
+def validate_host_name(data: dict):
+    host_name = data.get("host_name")
+    if host_name is not None and not isinstance(host_name, str):
+        raise InvalidRequest("host_name must be a string")
+    return host_name
 
 
 required_keys = {
@@ -44,31 +76,104 @@ required_keys = {
     "base_price": validate_price,
 }
 
-optional_keys = {**required_keys, "host_name": None}
+optional_keys = {**required_keys, "host_name": validate_host_name}
 
 
 def new_listing_id(existing_listings: List[Listing]):
     return max((listing.id for listing in existing_listings), default=0) + 1
 
 
-def convert_request_to_new_listing(data: dict, existing_listings=None) -> Listing:
+def validate_new_listing(data: dict) -> dict:
     if not data:
         raise InvalidRequest("must include listing data")
+    for key in data:
+        if key not in optional_keys:
+            raise InvalidRequest(f"unknown data key={key}")
     ret = {}
-    for key, func in required_keys.items():
-        if key not in data:
-            raise InvalidRequest(f"missing data key={key}")
-        if func:
+    for key, func in optional_keys.items():
+        if key in data:
             ret[key] = func(data)
-    new_listing_data = {**data, **ret}
+        elif key in required_keys:
+            raise InvalidRequest(f"missing data key={key}")
+    return {**data, **ret}
+
+
+def convert_request_to_new_listing(data: dict, existing_listings=None) -> Listing:
+    new_listing_data = validate_new_listing(data)
     return Listing(**new_listing_data, id=new_listing_id(existing_listings or list()))
 
 
-def create_new_listing(base_dir: str, data):
-    existing = list(Listing.existing(base_dir))
-    listing = convert_request_to_new_listing(data, existing_listings=existing)
-    Listing.write_to_file(chain(existing, [listing]), base_dir)
-    return jsonify(listing.to_dict())
+def create_new_listing(repository: ListingRepository, data):
+    new_listing_data = validate_new_listing(data)
+    listing = Listing(**new_listing_data, id=repository.store.allocate_id())
+    repository.put(listing)
+    return json_reply(listing.to_dict())
+
+
+def bulk_rows(body: bytes, mimetype: str) -> list:
+    """Rows of a bulk import: NDJSON, one row per line, or a JSON array.
+
+    An NDJSON line that does not parse is replaced by an ``InvalidRequest``.
+    """
+    if mimetype == NDJSON_MIMETYPE:
+        rows = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(loads(line))
+            except ValueError:
+                rows.append(InvalidRequest("unable to parse row"))
+        return rows
+    try:
+        rows = loads(body)
+    except ValueError:
+        raise InvalidRequest("unable to parse request body", status_code=400)
+    if not isinstance(rows, list):
+        raise InvalidRequest("must be a JSON array or NDJSON")
+    return rows
+
+
+def import_row(data) -> Listing:
+    """A new listing, without an id yet, from a request or export row."""
+    if isinstance(data, InvalidRequest):
+        raise data
+    if not isinstance(data, dict):
+        raise InvalidRequest("must be a JSON object")
+    data = {key: value for key, value in data.items() if key != "id"}
+    try:
+        for key in ("market", "currency"):
+            if key in data:
+                data[key] = code_of(data[key])
+    except KeyError:
+        raise InvalidRequest(f"{key} must be a code or an object with a code")
+    return Listing(**validate_new_listing(data), id=0)
+
+
+def bulk_create_listings(repository: ListingRepository, body: bytes, mimetype: str):
+    """Create every valid row with a single write; report the others by row."""
+    listings, created, errors = [], [], []
+    for row, data in enumerate(bulk_rows(body, mimetype)):
+        try:
+            listings.append(import_row(data))
+            created.append({"row": row})
+        except InvalidRequest as e:
+            errors.append({"row": row, "message": e.message})
+    if listings:
+        ids = repository.store.allocate_ids(len(listings))
+        for listing, result, listing_id in zip(listings, created, ids):
+            listing.id = result["id"] = listing_id
+        repository.put_many(listings)
+    return json_reply({"created": created, "errors": errors})
+
+
+def export_listings(repository: ListingRepository) -> Reply:
+    """Every listing in id order as NDJSON."""
+    listings = repository.query(None, [], {})
+    return Reply(
+        (dumps(listing.to_dict()) + "\n" for listing in listings),
+        mimetype=NDJSON_MIMETYPE,
+    )
 
 
 def base_prices_in_request(params: dict):
@@ -84,40 +189,84 @@ base_price_filter_lkp = {
 }
 
 
+def price_thresholds(
+    rates: dict, base_code: str, price_filters: List[Tuple[str, float]]
+) -> Dict[str, List[Tuple[callable, float]]]:
+    """Per listing currency, each base price predicate with its converted price."""
+    rate = convert_rate(rates, base_code)
+    return {
+        code: [
+            (base_price_filter_lkp[lkp_key], price * rate.get(code, 1))
+            for lkp_key, price in price_filters
+        ]
+        for code in {*Currencies.codes(), *rate}
+    }
+
+
 def rate_listing_filter(
     listings: Iterable[Listing],
-    rates: dict,
-    base_code: str,
-    price_func: callable,
-    price: float,
+    thresholds: Dict[str, List[Tuple[callable, float]]],
+    price_filters: List[Tuple[str, float]],
 ):
+    unconverted = [
+        (base_price_filter_lkp[lkp_key], price) for lkp_key, price in price_filters
+    ]
     for listing in listings:
-        rate = convert_rate(rates, base_code)
-        converted_price = price * rate.get(listing.currency.code, 1)
-        if price_func(listing, converted_price):
+        predicates = thresholds.get(listing.currency.code, unconverted)
+        if all(price_func(listing, price) for price_func, price in predicates):
             yield listing
 
 
+def market_filter(params: dict) -> Optional[Set[str]]:
+    if markets := params.get("market"):
+        return set(markets.split(","))
+    return None
+
+
+def base_price_filters(params: dict) -> List[Tuple[str, float]]:
+    filters = []
+    for base_price_key, base_price in base_prices_in_request(params).items():
+        price = parse_float(base_price, base_price_key)
+        lkp_key = base_price_key.split(".")[-1]
+        if lkp_key in base_price_filter_lkp:
+            filters.append((lkp_key, price))
+    return filters
+
+
 def filter_listings(
-    listings: Iterable[Listing], params: dict, rate_converter: RateConverter
+    listings: Iterable[Listing],
+    params: dict,
+    rate_converter: RateConverter,
+    after: Optional[int] = None,
+    limit: Optional[int] = None,
 ) -> Iterable[Listing]:
-    if markets := params.get("market"):
-        market_set = set(markets.split(","))
-        listings = (
-            listing for listing in listings if listing.market.code in market_set
-        )
-    if base_prices := base_prices_in_request(params):
+    market_set = market_filter(params)
+    price_filters, rates, currency = [], {}, None
+    if base_prices_in_request(params):
         currency: Currency = validate_currency(params)
         if not currency:
             raise InvalidRequest("must include currency when querying using base price")
-        rates = rate_converter.latest_rates(currency.code)
-        for base_price_key, base_price in base_prices.items():
-            price = parse_float(base_price, base_price_key)
-            lkp_key = base_price_key.split(".")[-1]
-            if price_func := base_price_filter_lkp.get(lkp_key):
-                listings = rate_listing_filter(
-                    listings, rates, currency.code, price_func, price
-                )
+        if (as_of := parse_date(params, "as_of")) is not None:
+            rates = historical(rate_converter.rates_on, as_of, currency.code)
+        else:
+            with span("latest_rates"):
+                rates = rate_converter.latest_rates(currency.code)
+        price_filters = base_price_filters(params)
+    if isinstance(listings, ListingRepository):
+        if currency:
+            rates = convert_rate(rates, currency.code)
+        return listings.query(market_set, price_filters, rates, after, limit)
+    if after is not None:
+        listings = (listing for listing in listings if listing.id > after)
+    if market_set is not None:
+        listings = (
+            listing for listing in listings if listing.market.code in market_set
+        )
+    if price_filters:
+        thresholds = price_thresholds(rates, currency.code, price_filters)
+        listings = rate_listing_filter(listings, thresholds, price_filters)
+    if limit is not None:
+        listings = islice(listings, limit)
     return listings
 
 
@@ -128,38 +277,251 @@ def parse_float(base_price, base_price_key):
         raise InvalidRequest(f"Unable to parse {base_price_key}={base_price}")
 
 
-def listing_get_request(request: Request, base_dir: str, rate_converter: RateConverter):
-    existing = Listing.existing(base_dir)
-    filtered_listings = filter_listings(existing, request.args, rate_converter)
-    return jsonify([x.to_dict() for x in filtered_listings])
+def parse_date(params: dict, key: str) -> Optional[date]:
+    if (value := params.get(key)) is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise InvalidRequest(f"Unable to parse {key}={value}")
+
+
+def historical(rates_func: callable, *args):
+    try:
+        return rates_func(*args)
+    except LookupError as e:
+        raise InvalidRequest(e.args[0])
+
+
+def parse_int(params: dict, key: str, minimum: int) -> Optional[int]:
+    if (value := params.get(key)) is None:
+        return None
+    try:
+        parsed = int(value)
+    except (TypeError, ValueError):
+        raise InvalidRequest(f"Unable to parse {key}={value}")
+    if parsed < minimum:
+        raise InvalidRequest(f"{key} must be at least {minimum}")
+    return parsed
 
 
-def delete_listing_by_id(existing_lkp, listing_id: int, base_dir: str):
-    if listing_id in existing_lkp:
-        existing_lkp.pop(listing_id)
-        Listing.write_to_file(existing_lkp.values(), base_dir)
-        return "success"
+def stream_listings(listings: Iterable[Listing], dumps: callable) -> Iterator[str]:
+    """Encode ``listings`` as a JSON array one listing at a time."""
+    separator = "["
+    for listing in listings:
+        yield separator + dumps(listing.to_dict())
+        separator = ","
+    yield "]\n" if separator == "," else "[]\n"
+
+
+def listing_get_request(
+    params: dict, repository: ListingRepository, rate_converter: RateConverter
+) -> Reply:
+    cursor = parse_int(params, "cursor", 0)
+    limit = parse_int(params, "limit", 1)
+    with span("filter_listings"):
+        filtered_listings = filter_listings(
+            repository,
+            params,
+            rate_converter,
+            after=cursor,
+            limit=None if limit is None else limit + 1,
+        )
+    headers = {}
+    if limit is not None:
+        filtered_listings = list(filtered_listings)
+        if len(filtered_listings) > limit:
+            filtered_listings = filtered_listings[:limit]
+            headers["X-Next-Cursor"] = str(filtered_listings[-1].id)
+    if params.get("stream", "").lower() in ("1", "true"):
+        return Reply(stream_listings(filtered_listings, dumps), headers=headers)
+    return json_reply([x.to_dict() for x in filtered_listings], headers=headers)
+
+
+def delete_listing_by_id(repository: ListingRepository, listing_id: int):
+    if listing_id in repository:
+        repository.delete(listing_id)
+        return Reply("success", mimetype="text/html")
     raise InvalidRequest("unable to find listing")
 
 
-def listing_by_id(existing_lkp: Dict[int, Listing], listing_id: int, **kwargs):
-    if listing := existing_lkp.get(listing_id):
-        return jsonify(listing)
+def listing_by_id(repository: ListingRepository, listing_id: int, **kwargs):
+    if listing := repository.get(listing_id):
+        return json_reply(listing)
     raise InvalidRequest("unable to find listing")
 
 
 def update_existing_listing(
-    existing_lkp: Dict[int, Listing], listing_id: int, base_dir: str, new_data: dict
+    repository: ListingRepository, listing_id: int, new_data: dict
 ):
-    if listing_id not in existing_lkp:
+    if not (existing := repository.get(listing_id)):
         raise InvalidRequest("unable to find listing")
-    listing = existing_lkp[listing_id]
-    for key, value in new_data.items():
-        if key not in optional_keys:
-            continue
-        if key in required_keys:
-            setattr(listing, key, required_keys[key](new_data))
-            continue
-        setattr(listing, key, value)
-    Listing.write_to_file(existing_lkp.values(), base_dir)
-    return jsonify(listing)
+    # the repository shares its instances, so validate against a copy
+    listing = replace(existing)
+    for key in new_data:
+        if key in optional_keys:
+            setattr(listing, key, optional_keys[key](new_data))
+    repository.put(listing)
+    return json_reply(listing)
+
+
+def parse_granularity(params: dict) -> str:
+    granularity = params.get("granularity", "day")
+    if granularity not in GRANULARITIES:
+        raise InvalidRequest(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    return granularity
+
+
+def calendar_rows(
+    listing: Listing,
+    currency_factor: float,
+    code: str,
+    start: date,
+    days: int,
+    granularity: str,
+    currency_factors: Optional[List[float]] = None,
+) -> List[dict]:
+    """Daily rows, or per week or month summaries, for ``days`` from ``start``."""
+    if granularity == "day":
+        with span("build_calendar"):
+            rows = build_calendar(
+                listing, currency_factor, code, start, currency_factors, days
+            )
+            return list(rows)
+    with span("build_calendar_summary"):
+        rows = build_calendar_summary(
+            listing, currency_factor, code, start, days, granularity, currency_factors
+        )
+        return list(rows)
+
+
+def listing_calendar_request(
+    repository: ListingRepository,
+    listing_id: int,
+    params: dict,
+    rate_converter: RateConverter,
+    cache: CalendarCache,
+):
+    local_listing = repository.get(listing_id)
+    if not local_listing:
+        raise InvalidRequest("unable to find listing")
+    as_of = parse_date(params, "as_of")
+    start, days = calendar_window(params, as_of)
+    granularity = parse_granularity(params)
+    rates, rates_id, currency_factors = {}, None, None
+    currency = local_listing.currency
+    if "currency" in params:
+        currency: Currency = validate_currency(params)
+        if as_of is not None:
+            currency_factors = historical(
+                rate_converter.currency_factors_on,
+                start,
+                days,
+                local_listing.currency.code,
+                currency.code,
+            )
+            rates_id = ("history", rate_converter.history.id)
+        elif snapshot := rate_converter.snapshot():
+            rates, rates_id = snapshot.rates_for(currency.code), snapshot.id
+    key = CalendarKey(
+        listing_id,
+        repository.version(listing_id),
+        currency.code,
+        rates_id,
+        start,
+        days,
+        granularity,
+    )
+    if (body := cache.get(key)) is not None:
+        return Reply(body)
+    rows = calendar_rows(
+        local_listing,
+        rates.get(local_listing.currency.code, 1),
+        currency.code,
+        start,
+        days,
+        granularity,
+        currency_factors,
+    )
+    reply = json_reply(rows)
+    cache.put(key, reply.body)
+    return reply
+
+
+def parse_listing_ids(value) -> List[int]:
+    """Listing ids given as a JSON list or a comma separated string."""
+    if isinstance(value, str):
+        value = [x for x in value.split(",") if x.strip()]
+    if not isinstance(value, list) or not value:
+        raise InvalidRequest("must include listing ids")
+    try:
+        ids = [int(x) for x in value]
+    except (TypeError, ValueError):
+        raise InvalidRequest("listing ids must be integers")
+    if len(ids) > MAX_CALENDAR_IDS:
+        raise InvalidRequest(f"at most {MAX_CALENDAR_IDS} listing ids")
+    return ids
+
+
+def calendar_window(
+    params: dict, default_start: Optional[date] = None
+) -> Tuple[date, int]:
+    """First day and number of days from ``start`` and an inclusive ``end``.
+
+    ``start`` defaults to ``default_start``, or today.
+    """
+    start = parse_date(params, "start") or default_start or datetime.now().date()
+    end = parse_date(params, "end")
+    days = CALENDAR_DAYS if end is None else (end - start).days + 1
+    if not 1 <= days <= CALENDAR_DAYS:
+        raise InvalidRequest(f"end must be within {CALENDAR_DAYS} days from start")
+    return start, days
+
+
+def stream_calendars(
+    listings: Dict[int, Listing],
+    listing_ids: List[int],
+    code: Optional[str],
+    rates: dict,
+    start: date,
+    days: int,
+    granularity: str = "day",
+) -> Iterator[str]:
+    """Encode one calendar per id as a JSON array, building each on demand."""
+    separator = "["
+    for listing_id in listing_ids:
+        if (listing := listings.get(listing_id)) is None:
+            item = {"id": listing_id, "error": "unable to find listing"}
+        else:
+            rows = calendar_rows(
+                listing,
+                rates.get(listing.currency.code, 1),
+                code or listing.currency.code,
+                start,
+                days,
+                granularity,
+            )
+            item = {"id": listing_id, "calendar": rows}
+        yield separator + dumps(item)
+        separator = ","
+    yield "]\n" if separator == "," else "[]\n"
+
+
+def calendars_request(
+    repository: ListingRepository, params: dict, rate_converter: RateConverter
+) -> Reply:
+    """Calendars of many listings from one store pass and one rates snapshot."""
+    if not isinstance(params, dict):
+        raise InvalidRequest("must be a JSON object")
+    listing_ids = parse_listing_ids(params.get("ids"))
+    start, days = calendar_window(params)
+    granularity = parse_granularity(params)
+    code, rates = None, {}
+    if "currency" in params:
+        code = validate_currency(params).code
+        if snapshot := rate_converter.snapshot():
+            rates = snapshot.rates_for(code)
+    listings = repository.get_many(listing_ids)
+    return Reply(
+        stream_calendars(listings, listing_ids, code, rates, start, days, granularity)
+    )
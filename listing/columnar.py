@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from currencies import Currencies
+from markets import Markets
+
+from listing.model import Listing
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+column_ops = {
+    "e": getattr(np, "equal", None),
+    "lt": getattr(np, "less", None),
+    "lte": getattr(np, "less_equal", None),
+    "gt": getattr(np, "greater", None),
+    "gte": getattr(np, "greater_equal", None),
+}
+
+
+class ListingColumns:
+    """NumPy column arrays for id, base_price, currency and market.
+
+    Rows are appended on create, overwritten in place on update and marked dead
+    on delete, so the repository can keep the columns in step with every write.
+    An update arrives as ``remove`` then ``add`` and reuses the listing's row;
+    dead rows are dropped before a query once they make up half the columns.
+    Price predicates are evaluated for the whole catalog in one vectorized pass.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.currency_codes: List[str] = list(Currencies.codes())
+        self.market_codes: List[str] = [market.code for market in Markets.get_all()]
+        self._currency_index = {code: i for i, code in enumerate(self.currency_codes)}
+        self._market_index = {code: i for i, code in enumerate(self.market_codes)}
+        self.row_of: Dict[int, int] = {}
+        self.size = 0
+        self.dead = 0
+        self.ids_sorted = True
+        self._currency_rate: Optional[Tuple[tuple, "np.ndarray"]] = None
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.base_price = np.zeros(capacity, dtype=np.float64)
+        self.currency = np.zeros(capacity, dtype=np.uint8)
+        self.market = np.zeros(capacity, dtype=np.uint8)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    @classmethod
+    def build(cls, listings: Iterable[Listing]) -> ListingColumns:
+        listings = list(listings)
+        columns = cls(capacity=max(len(listings), 1024))
+        for listing in listings:
+            columns.add(listing)
+        return columns
+
+    def add(self, listing: Listing):
+        if (row := self.row_of.get(listing.id)) is None:
+            if self.size == len(self.ids):
+                self._grow()
+            row = self.row_of[listing.id] = self.size
+            if self.size and listing.id < self.ids[self.size - 1]:
+                self.ids_sorted = False
+            self.size += 1
+            self._currency_rate = None
+        elif not self.alive[row]:
+            self.dead -= 1
+        currency = self._code(
+            self._currency_index, self.currency_codes, listing.currency.code
+        )
+        if self.currency[row] != currency:
+            self._currency_rate = None
+        self.ids[row] = listing.id
+        self.base_price[row] = listing.base_price
+        self.currency[row] = currency
+        self.market[row] = self._code(
+            self._market_index, self.market_codes, listing.market.code
+        )
+        self.alive[row] = True
+
+    def remove(self, listing: Listing):
+        # the row stays assigned to the id, for the add of an update to reuse
+        if (row := self.row_of.get(listing.id)) is not None and self.alive[row]:
+            self.alive[row] = False
+            self.dead += 1
+
+    def query(
+        self,
+        markets: Optional[Set[str]],
+        price_filters: List[Tuple[str, float]],
+        rates: dict,
+    ) -> Optional["np.ndarray"]:
+        """Sorted ids matching every filter, or ``None`` when nothing was filtered."""
+        if markets is None and not price_filters:
+            return None
+        if self.dead * 2 > self.size:
+            self._reclaim()
+        mask = self.alive[: self.size].copy()
+        if markets is not None:
+            allowed = np.zeros(len(self.market_codes), dtype=bool)
+            for market in markets:
+                if (code := self._market_index.get(market)) is not None:
+                    allowed[code] = True
+            mask &= allowed[self.market[: self.size]]
+        if price_filters:
+            currency_rate = self.currency_rate(rates)
+            base_price = self.base_price[: self.size]
+            threshold = np.empty_like(currency_rate)
+            matched = np.empty_like(mask)
+            for op, price in price_filters:
+                np.multiply(currency_rate, price, out=threshold)
+                column_ops[op](base_price, threshold, out=matched)
+                mask &= matched
+        ids = np.compress(mask, self.ids[: self.size])
+        if not self.ids_sorted:
+            ids.sort()
+        return ids
+
+    def currency_rate(self, rates: dict) -> "np.ndarray":
+        """Per row rate from the query currency into the listing currency.
+
+        Rates only change on refresh, so the gathered column is reused across
+        queries until the rates or the rows change.
+        """
+        key = tuple(rates.get(code, 1) for code in self.currency_codes)
+        if self._currency_rate is None or self._currency_rate[0] != key:
+            rate = np.array(key, dtype=np.float64)
+            self._currency_rate = key, rate[self.currency[: self.size]]
+        return self._currency_rate[1]
+
+    @staticmethod
+    def _code(index: Dict[str, int], codes: List[str], code: str) -> int:
+        if (position := index.get(code)) is None:
+            position = index[code] = len(codes)
+            codes.append(code)
+        return position
+
+    def _reclaim(self):
+        """Drop dead rows, keeping the live ones in order."""
+        alive = self.alive[: self.size].copy()
+        size = int(alive.sum())
+        for name in ("ids", "base_price", "currency", "market", "alive"):
+            column = getattr(self, name)
+            column[:size] = column[: self.size][alive]
+            column[size : self.size] = 0
+        self.row_of = {_id: row for row, _id in enumerate(self.ids[:size].tolist())}
+        self.size = size
+        self.dead = 0
+        self._currency_rate = None
+
+    def _grow(self):
+        capacity = len(self.ids) * 2
+        for name in ("ids", "base_price", "currency", "market", "alive"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[: len(column)] = column
+            setattr(self, name, grown)
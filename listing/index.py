@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from listing.model import Listing
+
+PriceKey = Tuple[float, int]
+
+_LOW = float("-inf")
+_HIGH = float("inf")
+
+
+def price_range(keys: List[PriceKey], op: str, price: float) -> List[PriceKey]:
+    """Slice of the (price, id) sorted ``keys`` matching ``base_price <op> price``."""
+    if op == "e":
+        return keys[
+            bisect_left(keys, (price, _LOW)) : bisect_right(keys, (price, _HIGH))
+        ]
+    if op == "lt":
+        return keys[: bisect_left(keys, (price, _LOW))]
+    if op == "lte":
+        return keys[: bisect_right(keys, (price, _HIGH))]
+    if op == "gt":
+        return keys[bisect_right(keys, (price, _HIGH)) :]
+    if op == "gte":
+        return keys[bisect_left(keys, (price, _LOW)) :]
+    raise KeyError(op)
+
+
+class ListingIndex:
+    """Secondary indexes over the listings of a repository.
+
+    Keeps market code -> ids, currency code -> ids and, per currency, the
+    ``(base_price, id)`` pairs in sorted order so price predicates become
+    bisect range scans.
+    """
+
+    def __init__(self):
+        self.by_market: Dict[str, Set[int]] = defaultdict(set)
+        self.by_currency: Dict[str, Set[int]] = defaultdict(set)
+        self.prices: Dict[str, List[PriceKey]] = defaultdict(list)
+
+    @classmethod
+    def build(cls, listings: Iterable[Listing]) -> ListingIndex:
+        index = cls()
+        for listing in listings:
+            index.by_market[listing.market.code].add(listing.id)
+            index.by_currency[listing.currency.code].add(listing.id)
+            index.prices[listing.currency.code].append((listing.base_price, listing.id))
+        for keys in index.prices.values():
+            keys.sort()
+        return index
+
+    def add(self, listing: Listing):
+        self.by_market[listing.market.code].add(listing.id)
+        self.by_currency[listing.currency.code].add(listing.id)
+        insort(self.prices[listing.currency.code], (listing.base_price, listing.id))
+
+    def remove(self, listing: Listing):
+        self.by_market[listing.market.code].discard(listing.id)
+        self.by_currency[listing.currency.code].discard(listing.id)
+        keys = self.prices[listing.currency.code]
+        key = (listing.base_price, listing.id)
+        position = bisect_left(keys, key)
+        if position < len(keys) and keys[position] == key:
+            del keys[position]
+
+    def query(
+        self,
+        markets: Optional[Set[str]],
+        price_filters: List[Tuple[str, float]],
+        rates: dict,
+    ) -> Optional[Set[int]]:
+        """Ids matching every filter, or ``None`` when nothing was filtered.
+
+        ``rates`` converts a price in the query currency into each listing
+        currency, so every predicate is evaluated with one threshold per
+        currency.
+        """
+        candidates: Optional[Set[int]] = None
+        if markets is not None:
+            candidates = set()
+            for market in markets:
+                candidates |= self.by_market.get(market, set())
+        for op, price in price_filters:
+            if candidates is not None and not candidates:
+                break
+            matched = set()
+            for code, ids in self.by_currency.items():
+                if not ids:
+                    continue
+                threshold = price * rates.get(code, 1)
+                matched.update(
+                    _id for _, _id in price_range(self.prices[code], op, threshold)
+                )
+            candidates = matched if candidates is None else candidates & matched
+        return candidates
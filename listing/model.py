@@ -1,31 +1,75 @@
 from __future__ import annotations
 
-import json
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 from itertools import chain
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Union
 
-from currencies import Currency
-from markets import Market
+from currencies import Currencies, Currency
+from markets import Market, Markets
+from metrics import span
 
+from listing.store import ListingStore
 
-@dataclass
+
+@dataclass(init=False)
 class Listing:
+    # spelled out rather than dataclass(slots=True), which needs Python 3.10;
+    # a slot cannot have a class-level default, hence the __init__ below
+    __slots__ = ("id", "title", "base_price", "currency", "market", "host_name")
+
     id: int
     title: str
     base_price: float
     currency: Currency
     market: Market
-    host_name: Optional[str] = None
+    host_name: Optional[str]
+
+    def __init__(
+        self,
+        id: int,
+        title: str,
+        base_price: float,
+        currency: Currency,
+        market: Market,
+        host_name: Optional[str] = None,
+    ):
+        self.id = id
+        self.title = title
+        self.base_price = base_price
+        self.currency = currency
+        self.market = market
+        self.host_name = host_name
 
     def to_dict(self):
-        return asdict(self)
+        return {
+            "id": self.id,
+            "title": self.title,
+            "base_price": self.base_price,
+            "currency": self.currency.to_dict(),
+            "market": self.market.to_dict(),
+            "host_name": self.host_name,
+        }
+
+    def to_record(self) -> dict:
+        """The stored form, referring to the market and currency by code."""
+        return {
+            "id": self.id,
+            "title": self.title,
+            "base_price": self.base_price,
+            "currency": self.currency.code,
+            "market": self.market.code,
+            "host_name": self.host_name,
+        }
 
     @classmethod
     def from_dict(cls, data: dict):
-        market = Market(**data["market"])
-        currency = Currency(**data["currency"])
+        """Build from ``to_dict`` or ``to_record`` output.
+
+        Markets and currencies resolve to the shared registry instances.
+        """
+        market = Markets.resolve(data["market"])
+        currency = Currencies.resolve(data["currency"])
         raw = {**data, "market": market, "currency": currency}
         return Listing(**raw)
 
@@ -35,11 +79,10 @@ class Listing:
 
     @classmethod
     def existing(cls, base_dir: str) -> Iterable[Listing]:
-        path = Path(base_dir) / "data" / "listing.json"
-        if not path.exists():
+        store = ListingStore.for_dir(base_dir)
+        if not store.exists():
             return []
-        with open(path, "r") as fp:
-            return (Listing.from_dict(x) for x in json.load(fp))
+        return (Listing.from_dict(x) for x in store.records())
 
     @classmethod
     def existing_by_id(cls, _id: int, base_dir: str):
@@ -52,9 +95,13 @@ class Listing:
 
     @classmethod
     def write_to_file(cls, data: Iterable[Listing], base_dir: str = None):
-        path = Path(base_dir) / "data" / "listing.json"
-        if not path.exists():
-            path.parent.mkdir(parents=True, exist_ok=True)
-        raw_data = [x.to_dict() for x in data]
-        with open(path, "w") as fp:
-            json.dump(raw_data, fp)
+        with span("write_to_file"):
+            ListingStore.for_dir(base_dir).replace_all(x.to_record() for x in data)
+
+    @classmethod
+    def save(cls, listing: Listing, base_dir: str):
+        ListingStore.for_dir(base_dir).put(listing.to_record())
+
+    @classmethod
+    def remove(cls, listing_id: int, base_dir: str):
+        ListingStore.for_dir(base_dir).delete(listing_id)
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import threading
+from bisect import bisect_right
+from itertools import count
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from metrics import LISTING_RELOADS, span
+
+from listing.index import ListingIndex
+from listing.model import Listing
+from listing.store import DELETE, PUT, ListingStore, LogPosition, log_entries
+
+
+class ListingRepository:
+    """Long-lived, in-memory index of the listings held by a ``ListingStore``.
+
+    The store is loaded once; afterwards each access only replays the lines
+    appended to the log since the last one, and falls back to a full reload
+    when the snapshot is rewritten or the log is rotated by another writer.
+    A ``ListingIndex`` is kept in step with every change for ``query``; with
+    ``columnar`` set and NumPy installed, ``ListingColumns`` is used instead.
+
+    Every stored listing gets a version that is never reused, and
+    ``listeners`` are called with the id of any listing changed or removed.
+    """
+
+    def __init__(self, store: ListingStore, columnar: bool = False):
+        self.store = store
+        self._lock = threading.RLock()
+        self._listings: Dict[int, Listing] = {}
+        self._index_type = ListingIndex
+        if columnar:
+            # imported here so NumPy is only loaded when columns are asked for
+            from listing.columnar import ListingColumns, np
+
+            if np is not None:
+                self._index_type = ListingColumns
+        self._index = self._index_type()
+        self._position: Optional[LogPosition] = None
+        self._versions: Dict[int, int] = {}
+        self._next_version = count(1)
+        self.listeners: List[Callable[[int], None]] = []
+
+    def refresh(self):
+        with self._lock:
+            if self._position is not None:
+                if (tail := self.store.tail(self._position)) is not None:
+                    lines, self._position = tail
+                    self._apply(lines)
+                    return
+            with span("load_listings"):
+                records, self._position = self.store.load()
+                self._listings = {
+                    _id: Listing.from_dict(x) for _id, x in records.items()
+                }
+                self._index = self._index_type.build(self._listings.values())
+                self._versions = {
+                    _id: next(self._next_version) for _id in self._listings
+                }
+            LISTING_RELOADS.inc()
+
+    def get(self, listing_id: int) -> Optional[Listing]:
+        self.refresh()
+        return self._listings.get(listing_id)
+
+    def get_many(self, listing_ids: Iterable[int]) -> Dict[int, Listing]:
+        """The listings found among ``listing_ids``, after a single refresh."""
+        with self._lock:
+            self.refresh()
+            return {
+                _id: listing
+                for _id in listing_ids
+                if (listing := self._listings.get(_id)) is not None
+            }
+
+    def version(self, listing_id: int) -> Optional[int]:
+        self.refresh()
+        return self._versions.get(listing_id)
+
+    def __contains__(self, listing_id: int) -> bool:
+        return self.get(listing_id) is not None
+
+    def values(self) -> Iterator[Listing]:
+        self.refresh()
+        return iter(list(self._listings.values()))
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._listings)
+
+    def query(
+        self,
+        markets: Optional[Set[str]],
+        price_filters: List[Tuple[str, float]],
+        rates: dict,
+        after: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[Listing]:
+        """Listings in id order matching the filters; see ``ListingIndex.query``.
+
+        ``after`` and ``limit`` select a page by listing id before any listing
+        is looked up.
+        """
+        with self._lock:
+            self.refresh()
+            ids = self._index.query(markets, price_filters, rates)
+            if ids is None:
+                ids = sorted(self._listings)
+            elif isinstance(ids, set):
+                ids = sorted(ids)
+            start = 0 if after is None else bisect_right(ids, after)
+            ids = ids[start : None if limit is None else start + limit]
+            if not isinstance(ids, list):
+                ids = ids.tolist()
+            return [self._listings[_id] for _id in ids]
+
+    def put(self, listing: Listing):
+        with self._lock:
+            self._advance(self.store.put(listing.to_record(), self._position))
+            self._set(listing)
+
+    def put_many(self, listings: List[Listing]):
+        with self._lock:
+            records = (listing.to_record() for listing in listings)
+            self._advance(self.store.put_many(records, self._position))
+            for listing in listings:
+                self._set(listing)
+
+    def delete(self, listing_id: int):
+        with self._lock:
+            self._advance(self.store.delete(listing_id, self._position))
+            self._drop(listing_id)
+
+    def _advance(self, position: Optional[LogPosition]):
+        # Skip past our own write unless someone else appended first, in which
+        # case the next refresh replays theirs and ours in log order.
+        if position is not None:
+            self._position = position
+
+    def _apply(self, lines: List[str]):
+        for entry in log_entries(lines):
+            if entry["op"] == PUT:
+                self._set(Listing.from_dict(entry["listing"]))
+            elif entry["op"] == DELETE:
+                self._drop(entry["id"])
+
+    def _set(self, listing: Listing):
+        if (current := self._listings.get(listing.id)) is not None:
+            self._index.remove(current)
+        self._listings[listing.id] = listing
+        self._index.add(listing)
+        self._versions[listing.id] = next(self._next_version)
+        if current is not None:
+            self._notify(listing.id)
+
+    def _drop(self, listing_id: int):
+        if (listing := self._listings.pop(listing_id, None)) is not None:
+            self._index.remove(listing)
+            del self._versions[listing_id]
+            self._notify(listing_id)
+
+    def _notify(self, listing_id: int):
+        for listener in self.listeners:
+            listener(listing_id)
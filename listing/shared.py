@@ -0,0 +1,406 @@
+"""Listings shared by every worker process through one memory-mapped file.
+
+In shared mode each snapshot the store writes is also published as
+``listing.shared.<generation>``: the listings sorted by id, laid out as
+columns so workers map it read-only and use it without copying:
+
+    header   "<4sHHHHQQ4x" magic, version, market count, currency count,
+             reserved, row count, string table size
+    codes    "<II" (offset, length) into the string table per market, then
+             per currency
+    columns  id int64, base price float64, title offset, title length,
+             host name offset and host name length uint32, market index and
+             currency index uint16; one array each, in that order
+    strings  utf-8
+
+Whatever was written since the published generation is replayed from the
+store's log into a small per-process overlay. When the log is compacted a new
+generation is published and every worker switches to it on its next access,
+so memory stays flat however many workers run:
+
+    LISTING_API_LISTING_SHARED=true gunicorn -w 8 'app:create_app()'
+"""
+
+from __future__ import annotations
+
+import mmap
+import operator
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import partial
+from heapq import merge
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from currencies import Currencies
+from markets import Markets
+from metrics import LISTING_RELOADS, span
+
+from listing.model import Listing
+from listing.repository import ListingRepository
+from listing.snapshot import CODE, NONE_INDEX, NONE_LENGTH, _StringTable, code_of
+from listing.store import ListingStore
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+MAGIC = b"LSHM"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHHQQ4x")
+SHARED_NAME = "listing.shared"
+
+price_ops = {
+    "e": operator.eq,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "gt": operator.gt,
+    "gte": operator.ge,
+}
+
+
+def shared_path(data_dir: Path, generation: int) -> Path:
+    return data_dir / f"{SHARED_NAME}.{generation}"
+
+
+def dumps(records: Iterable[dict]) -> bytes:
+    records = sorted(records, key=lambda x: x["id"])
+    strings = _StringTable()
+    markets: Dict[str, int] = {}
+    currencies: Dict[str, int] = {}
+    columns = {
+        "ids": array("q"),
+        "base_price": array("d"),
+        "title_offset": array("I"),
+        "title_length": array("I"),
+        "host_offset": array("I"),
+        "host_length": array("I"),
+        "market": array("H"),
+        "currency": array("H"),
+    }
+    for record in records:
+        market = code_of(record.get("market"))
+        currency = code_of(record.get("currency"))
+        title_offset, title_length = strings.add(record.get("title"))
+        host_offset, host_length = strings.add(record.get("host_name"))
+        columns["ids"].append(record["id"])
+        columns["base_price"].append(record["base_price"])
+        columns["title_offset"].append(title_offset)
+        columns["title_length"].append(title_length)
+        columns["host_offset"].append(host_offset)
+        columns["host_length"].append(host_length)
+        columns["market"].append(
+            NONE_INDEX if market is None else markets.setdefault(market, len(markets))
+        )
+        columns["currency"].append(
+            NONE_INDEX
+            if currency is None
+            else currencies.setdefault(currency, len(currencies))
+        )
+    codes = b"".join(CODE.pack(*strings.add(code)) for code in [*markets, *currencies])
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        len(markets),
+        len(currencies),
+        0,
+        len(records),
+        len(strings.data),
+    )
+    body = b"".join(column.tobytes() for column in columns.values())
+    return header + codes + body + strings.data
+
+
+def publish(data_dir: Path, records: List[dict], generation: int):
+    """Write ``generation`` and drop all but the one before it.
+
+    The previous generation is kept for workers still opening it; older
+    files stay readable through any mapping left until it is closed.
+    """
+    tmp_path = data_dir / f"{SHARED_NAME}.{os.getpid()}.tmp"
+    tmp_path.write_bytes(dumps(records))
+    os.replace(tmp_path, shared_path(data_dir, generation))
+    for path in data_dir.glob(f"{SHARED_NAME}.*"):
+        suffix = path.suffix[1:]
+        if suffix.isdigit() and int(suffix) < generation - 1:
+            path.unlink(missing_ok=True)
+
+
+class SharedListings:
+    """One published generation, mapped read-only.
+
+    Columns are views straight into the mapping, NumPy arrays when NumPy is
+    installed and typed ``memoryview`` otherwise; listings are built on access.
+    """
+
+    def __init__(self, path: Path, generation: int):
+        self.generation = generation
+        with open(path, "rb") as fp:
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, market_count, currency_count, _, count, strings_size = (
+            HEADER.unpack_from(self._map)
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not a version {VERSION} shared listing snapshot")
+        self.size = count
+        view = memoryview(self._map)
+        codes_end = HEADER.size + (market_count + currency_count) * CODE.size
+        offset = codes_end
+        for name, typecode in (
+            ("ids", "q"),
+            ("base_price", "d"),
+            ("title_offset", "I"),
+            ("title_length", "I"),
+            ("host_offset", "I"),
+            ("host_length", "I"),
+            ("market", "H"),
+            ("currency", "H"),
+        ):
+            size = array(typecode).itemsize * count
+            column = view[offset : offset + size].cast(typecode)
+            if np is not None and name in ("ids", "base_price", "market", "currency"):
+                column = np.frombuffer(column, dtype=typecode)
+            setattr(self, name, column)
+            offset += size
+        self._strings = view[offset : offset + strings_size]
+        codes = [
+            self._string(*ref)
+            for ref in CODE.iter_unpack(view[HEADER.size : codes_end])
+        ]
+        self.market_codes = codes[:market_count]
+        self.currency_codes = codes[market_count:]
+        self._markets = [Markets.resolve(code) for code in self.market_codes]
+        self._currencies = [Currencies.resolve(code) for code in self.currency_codes]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def row_of(self, listing_id: int) -> Optional[int]:
+        if np is not None:
+            row = int(np.searchsorted(self.ids, listing_id))
+        else:
+            row = bisect_left(self.ids, listing_id)
+        if row < self.size and self.ids[row] == listing_id:
+            return row
+        return None
+
+    def listing(self, row: int) -> Listing:
+        market = self.market[row]
+        currency = self.currency[row]
+        return Listing(
+            id=int(self.ids[row]),
+            title=self._string(self.title_offset[row], self.title_length[row]),
+            base_price=float(self.base_price[row]),
+            currency=None if currency == NONE_INDEX else self._currencies[currency],
+            market=None if market == NONE_INDEX else self._markets[market],
+            host_name=self._string(self.host_offset[row], self.host_length[row]),
+        )
+
+    def query(
+        self,
+        markets: Optional[Set[str]],
+        price_filters: List[Tuple[str, float]],
+        rates: dict,
+    ):
+        """Sorted ids matching every filter; all of them when nothing is filtered."""
+        if markets is None and not price_filters:
+            return self.ids
+        allowed = {
+            index
+            for index, code in enumerate(self.market_codes)
+            if markets is None or code in markets
+        }
+        currency_rates = [rates.get(code, 1) for code in self.currency_codes]
+        if np is None:
+            return array(
+                "q",
+                (
+                    self.ids[row]
+                    for row in range(self.size)
+                    if self.market[row] in allowed
+                    and all(
+                        price_ops[op](
+                            self.base_price[row],
+                            price * currency_rates[self.currency[row]],
+                        )
+                        for op, price in price_filters
+                    )
+                ),
+            )
+        if markets is None:
+            mask = np.ones(self.size, dtype=bool)
+        else:
+            mask = np.isin(self.market, list(allowed))
+        if price_filters:
+            currency_rate = np.array(currency_rates or [1], dtype=np.float64)[
+                self.currency
+            ]
+            for op, price in price_filters:
+                mask &= price_ops[op](self.base_price, currency_rate * price)
+        return self.ids[mask]
+
+    def after(self, ids, listing_id: Optional[int]) -> int:
+        """Position in the sorted ``ids`` of the first id past ``listing_id``."""
+        if listing_id is None:
+            return 0
+        if np is not None and isinstance(ids, np.ndarray):
+            return int(np.searchsorted(ids, listing_id, side="right"))
+        return bisect_right(ids, listing_id)
+
+    def _string(self, offset: int, length: int) -> Optional[str]:
+        if length == NONE_LENGTH:
+            return None
+        return str(self._strings[offset : offset + length], "utf-8")
+
+
+class SharedListingRepository(ListingRepository):
+    """``ListingRepository`` over the published ``SharedListings``.
+
+    Only the listings written since the published generation are held per
+    process, in an overlay where a deleted listing maps to ``None``. Listings
+    from the shared file take the negated generation as their version, which
+    no overlay version ever equals.
+    """
+
+    def __init__(self, store: ListingStore):
+        # publishes through its own store, leaving other users of ``store``'s
+        # directory to rewrite without publishing
+        super().__init__(store.publishing(partial(publish, store.data_dir)))
+        self._shared: Optional[SharedListings] = None
+        self._overlay: Dict[int, Optional[Listing]] = {}
+
+    def refresh(self):
+        with self._lock:
+            while True:
+                shared = self._shared
+                if shared is None or shared.generation != self.store.generation():
+                    self._map()
+                if (tail := self.store.tail(self._position)) is not None:
+                    lines, self._position = tail
+                    self._apply(lines)
+                    return
+                # Either another worker published since the check above, and
+                # the next pass maps it, or the snapshot was rewritten by a
+                # process not in shared mode and has to be published.
+                self.store.checkpoint(self._shared.generation)
+
+    def get(self, listing_id: int) -> Optional[Listing]:
+        with self._lock:
+            self.refresh()
+            return self._lookup(listing_id)
+
+    def get_many(self, listing_ids: Iterable[int]) -> Dict[int, Listing]:
+        with self._lock:
+            self.refresh()
+            return {
+                _id: listing
+                for _id in listing_ids
+                if (listing := self._lookup(_id)) is not None
+            }
+
+    def version(self, listing_id: int) -> Optional[int]:
+        with self._lock:
+            self.refresh()
+            if listing_id in self._overlay:
+                return self._versions.get(listing_id)
+            if self._shared.row_of(listing_id) is None:
+                return None
+            return -self._shared.generation
+
+    def values(self) -> Iterator[Listing]:
+        return iter(self.query(None, [], {}))
+
+    def __len__(self) -> int:
+        with self._lock:
+            self.refresh()
+            size = len(self._shared)
+            for _id, listing in self._overlay.items():
+                shared = self._shared.row_of(_id) is not None
+                size += (listing is not None) - shared
+            return size
+
+    def query(
+        self,
+        markets: Optional[Set[str]],
+        price_filters: List[Tuple[str, float]],
+        rates: dict,
+        after: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[Listing]:
+        with self._lock:
+            self.refresh()
+            shared, overlay = self._shared, self._overlay
+            ids = shared.query(markets, price_filters, rates)
+            start = shared.after(ids, after)
+            # every overlay id skipped here may be one more to read
+            stop = None if limit is None else start + limit + len(overlay)
+            shared_ids = [_id for _id in ids[start:stop].tolist() if _id not in overlay]
+            overlay_ids = sorted(
+                _id
+                for _id, listing in overlay.items()
+                if listing is not None
+                and (after is None or _id > after)
+                and self._matches(listing, markets, price_filters, rates)
+            )
+            return [
+                self._lookup(_id)
+                for _id in islice(merge(shared_ids, overlay_ids), limit)
+            ]
+
+    def _map(self):
+        with span("map_listings"):
+            while True:
+                generation, position = self.store.published()
+                if generation:
+                    try:
+                        path = shared_path(self.store.data_dir, generation)
+                        self._shared = SharedListings(path, generation)
+                        break
+                    except FileNotFoundError:
+                        if self.store.generation() != generation:
+                            continue
+                # nothing published yet, or the published file went missing
+                self.store.checkpoint(generation)
+            self._position = position
+            self._overlay = {}
+            self._versions = {}
+        LISTING_RELOADS.inc()
+
+    def _lookup(self, listing_id: int) -> Optional[Listing]:
+        if listing_id in self._overlay:
+            return self._overlay[listing_id]
+        if self._shared is None or (row := self._shared.row_of(listing_id)) is None:
+            return None
+        return self._shared.listing(row)
+
+    @staticmethod
+    def _matches(
+        listing: Listing,
+        markets: Optional[Set[str]],
+        price_filters: List[Tuple[str, float]],
+        rates: dict,
+    ) -> bool:
+        if markets is not None and listing.market.code not in markets:
+            return False
+        rate = rates.get(listing.currency.code, 1)
+        return all(
+            price_ops[op](listing.base_price, price * rate)
+            for op, price in price_filters
+        )
+
+    def _set(self, listing: Listing):
+        existed = self._lookup(listing.id) is not None
+        self._overlay[listing.id] = listing
+        self._versions[listing.id] = next(self._next_version)
+        if existed:
+            self._notify(listing.id)
+
+    def _drop(self, listing_id: int):
+        if self._lookup(listing_id) is not None:
+            self._overlay[listing_id] = None
+            self._versions.pop(listing_id, None)
+            self._notify(listing_id)
@@ -0,0 +1,155 @@
+"""Compact binary snapshot of listing records.
+
+Markets and currencies are stored once per file as codes and every row refers
+to them by index; titles and host names live in a deduplicated string table:
+
+    header   "<4sHHHII" magic, version, market count, currency count,
+             row count, string table size
+    codes    "<II" (offset, length) into the string table per market, then
+             per currency
+    rows     "<qdHHIIII" id, base price, market index, currency index,
+             title offset and length, host name offset and length
+    strings  utf-8
+
+A missing market or currency is stored as ``NONE_INDEX`` and a missing host
+name with length ``NONE_LENGTH``. Records are the normalized dicts produced by
+``Listing.to_record``; the legacy shape embedding the full market and currency
+dicts is accepted on write.
+
+Convert a data directory still holding the JSON snapshot with
+
+    python -m listing.snapshot BASE_DIR
+"""
+
+import argparse
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b"LSTS"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHII")
+CODE = struct.Struct("<II")
+ROW = struct.Struct("<qdHHIIII")
+NONE_INDEX = 0xFFFF
+NONE_LENGTH = 0xFFFFFFFF
+
+
+def code_of(value) -> Optional[str]:
+    """The code of a market or currency given as a code or a legacy dict."""
+    if isinstance(value, dict):
+        return value["code"]
+    return value
+
+
+class _StringTable:
+    def __init__(self):
+        self.offsets: Dict[str, Tuple[int, int]] = {}
+        self.data = bytearray()
+
+    def add(self, value: Optional[str]) -> Tuple[int, int]:
+        if value is None:
+            return 0, NONE_LENGTH
+        if (ref := self.offsets.get(value)) is None:
+            encoded = value.encode()
+            ref = self.offsets[value] = len(self.data), len(encoded)
+            self.data += encoded
+        return ref
+
+
+def dumps(records: Iterable[dict]) -> bytes:
+    """Encode ``records``; ``ValueError`` names a listing that does not fit."""
+    strings = _StringTable()
+    markets: Dict[str, int] = {}
+    currencies: Dict[str, int] = {}
+    rows = bytearray()
+    count = 0
+    for record in records:
+        try:
+            market = code_of(record.get("market"))
+            currency = code_of(record.get("currency"))
+            rows += ROW.pack(
+                record["id"],
+                record["base_price"],
+                (
+                    NONE_INDEX
+                    if market is None
+                    else markets.setdefault(market, len(markets))
+                ),
+                (
+                    NONE_INDEX
+                    if currency is None
+                    else currencies.setdefault(currency, len(currencies))
+                ),
+                *strings.add(record.get("title")),
+                *strings.add(record.get("host_name")),
+            )
+        except (AttributeError, KeyError, TypeError, struct.error) as e:
+            raise ValueError(
+                f"unable to encode listing id={record.get('id')}: {e}"
+            ) from e
+        count += 1
+    codes = b"".join(CODE.pack(*strings.add(code)) for code in [*markets, *currencies])
+    header = HEADER.pack(
+        MAGIC, VERSION, len(markets), len(currencies), count, len(strings.data)
+    )
+    return header + codes + rows + strings.data
+
+
+def loads(data: bytes) -> List[dict]:
+    magic, version, market_count, currency_count, count, strings_size = (
+        HEADER.unpack_from(data)
+    )
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} listing snapshot")
+    codes_end = HEADER.size + (market_count + currency_count) * CODE.size
+    rows_end = codes_end + count * ROW.size
+    strings = data[rows_end : rows_end + strings_size]
+
+    def string(offset: int, length: int) -> Optional[str]:
+        if length == NONE_LENGTH:
+            return None
+        return strings[offset : offset + length].decode()
+
+    codes = [string(*ref) for ref in CODE.iter_unpack(data[HEADER.size : codes_end])]
+    markets = codes[:market_count]
+    currencies = codes[market_count:]
+    records = []
+    for row in ROW.iter_unpack(data[codes_end:rows_end]):
+        _id, base_price, market, currency, *title, host_offset, host_length = row
+        record = {"id": _id, "title": string(*title), "base_price": base_price}
+        if market != NONE_INDEX:
+            record["market"] = markets[market]
+        if currency != NONE_INDEX:
+            record["currency"] = currencies[currency]
+        if host_length != NONE_LENGTH:
+            record["host_name"] = string(host_offset, host_length)
+        records.append(record)
+    return records
+
+
+def migrate(base_dir) -> int:
+    """Rewrite the JSON snapshot of ``base_dir`` as a binary one.
+
+    Returns the number of listings migrated.
+    """
+    from listing.store import ListingStore
+
+    store = ListingStore.for_dir(base_dir)
+    if not store.legacy_snapshot_path.exists():
+        return 0
+    records = list(store.records())
+    store.replace_all(records)
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate a JSON listing snapshot.")
+    parser.add_argument("base_dir", nargs="?", default=".")
+    args = parser.parse_args()
+    count = migrate(Path(args.base_dir))
+    print(f"migrated {count} listings")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,506 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from listing import snapshot
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no advisory locks on this platform
+    fcntl = None
+
+SNAPSHOT_NAME = "listing.bin"
+LEGACY_SNAPSHOT_NAME = "listing.json"
+LOG_NAME = "listing.log"
+COMPACTING_NAME = "listing.log.compacting"
+LOCK_NAME = "listing.lock"
+SEQUENCE_NAME = "listing.seq"
+GENERATION_NAME = "listing.generation"
+
+DEFAULT_COMPACT_THRESHOLD = 1024 * 1024
+
+PUT = "put"
+DELETE = "delete"
+
+# generation, then the (inode, mtime, size) of the snapshot it was built from
+GENERATION = struct.Struct("<QQqQ")
+
+
+FileSignature = Optional[Tuple[int, int, int]]
+
+
+class LogPosition(NamedTuple):
+    """How far a reader has consumed the store; see ``ListingStore.tail``."""
+
+    base: Tuple[FileSignature, FileSignature]
+    log_inode: Optional[int]
+    log_offset: int
+
+
+def file_signature(path: Path) -> FileSignature:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def log_entries(lines: Iterable[str]) -> Iterator[dict]:
+    """Parse log lines; a torn trailing line is ignored."""
+    for line in lines:
+        if not line.endswith("\n"):
+            break
+        yield json.loads(line)
+
+
+def replay(records: Dict[int, dict], lines: Iterable[str]) -> Dict[int, dict]:
+    for entry in log_entries(lines):
+        if entry["op"] == PUT:
+            listing = entry["listing"]
+            records[listing["id"]] = listing
+        elif entry["op"] == DELETE:
+            records.pop(entry["id"], None)
+    return records
+
+
+def drop_torn_line(fd: int, size: int) -> int:
+    """Cut a partial last line left by a crashed writer; the log's new size.
+
+    Otherwise the next append would be written onto the fragment and turn both
+    into one line that never parses.
+    """
+    if not size or os.pread(fd, 1, size - 1) == b"\n":
+        return size
+    end = size
+    while end:
+        start = max(end - 4096, 0)
+        chunk = os.pread(fd, end - start, start)
+        if (newline := chunk.rfind(b"\n")) != -1:
+            end = start + newline + 1
+            break
+        end = start
+    os.ftruncate(fd, end)
+    return end
+
+
+class ListingStore:
+    """Snapshot file plus an append-only log of create/update/delete records.
+
+    Writes append one line to ``listing.log``. Readers load the
+    ``listing.bin`` snapshot (see ``listing.snapshot``) and replay the log on
+    top of it; a ``listing.json`` snapshot from before the binary format is
+    still read and replaced by the next snapshot written. Once the log
+    grows past ``compact_threshold`` bytes it is folded into a new snapshot on
+    a background thread.
+
+    Writers in every process serialize on an advisory lock on
+    ``listing.lock``; readers take it shared. Files are only ever rewritten
+    through a temporary file and ``os.replace``, so a reader never sees a
+    partial snapshot. ``allocate_id`` hands out ids from ``listing.seq``.
+
+    With a ``publisher``, every snapshot rewrite made through this store,
+    including compaction, happens synchronously and is handed to the publisher
+    under the lock with a new generation number, which is then recorded in
+    ``listing.generation``; see ``publishing``.
+    """
+
+    __STORES__: Dict[Path, ListingStore] = {}
+    __STORES_LOCK__ = threading.Lock()
+
+    def __init__(
+        self,
+        base_dir: Union[str, Path],
+        compact_threshold: int = DEFAULT_COMPACT_THRESHOLD,
+        publisher: Optional[Callable[[List[dict], int], None]] = None,
+    ):
+        self.data_dir = Path(base_dir) / "data"
+        self.snapshot_path = self.data_dir / SNAPSHOT_NAME
+        self.legacy_snapshot_path = self.data_dir / LEGACY_SNAPSHOT_NAME
+        self.log_path = self.data_dir / LOG_NAME
+        self.compacting_path = self.data_dir / COMPACTING_NAME
+        self.lock_path = self.data_dir / LOCK_NAME
+        self.sequence_path = self.data_dir / SEQUENCE_NAME
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_fd: Optional[int] = None
+        self._compactor: Optional[threading.Thread] = None
+        self.generation_path = self.data_dir / GENERATION_NAME
+        self.publisher = publisher
+        self._generation_map: Optional[mmap.mmap] = None
+
+    @classmethod
+    def for_dir(cls, base_dir: Union[str, Path]) -> ListingStore:
+        key = Path(base_dir).resolve()
+        with cls.__STORES_LOCK__:
+            if (store := cls.__STORES__.get(key)) is None:
+                store = cls.__STORES__[key] = cls(key)
+            return store
+
+    def publishing(self, publisher: Callable[[List[dict], int], None]) -> ListingStore:
+        """A store over the same files whose rewrites are handed to ``publisher``.
+
+        This store, which ``for_dir`` may share across the process, keeps
+        rewriting without publishing.
+        """
+        return type(self)(self.data_dir.parent, self.compact_threshold, publisher)
+
+    def exists(self) -> bool:
+        return any(
+            path.exists()
+            for path in (
+                self.snapshot_path,
+                self.legacy_snapshot_path,
+                self.compacting_path,
+                self.log_path,
+            )
+        )
+
+    def records(self) -> Iterator[dict]:
+        records, _ = self.load()
+        return iter(records.values())
+
+    def load(self) -> Tuple[Dict[int, dict], LogPosition]:
+        with self._locked(exclusive=False):
+            base = self._base_signature()
+            records = self._read_snapshot()
+            self._replay_file(records, self.compacting_path)
+            lines, log_inode, log_offset = self._read_log(None, 0)
+        return replay(records, lines), LogPosition(base, log_inode, log_offset)
+
+    def tail(self, position: LogPosition) -> Optional[Tuple[List[str], LogPosition]]:
+        """Log lines appended since ``position``.
+
+        Returns ``None`` when the snapshot was rewritten or the log rotated, in
+        which case the caller has to ``load`` again.
+        """
+        with self._locked(exclusive=False):
+            if self._base_signature() != position.base:
+                return None
+            log_signature = file_signature(self.log_path)
+            if log_signature is None:
+                if position.log_offset:
+                    return None
+                return [], position
+            log_inode, _, log_size = log_signature
+            if position.log_inode not in (None, log_inode):
+                return None
+            if log_size < position.log_offset:
+                return None
+            if log_size == position.log_offset:
+                return [], position
+            lines, log_inode, log_offset = self._read_log(
+                position.log_inode, position.log_offset
+            )
+        return lines, LogPosition(position.base, log_inode, log_offset)
+
+    def put(
+        self, record: dict, position: Optional[LogPosition] = None
+    ) -> Optional[LogPosition]:
+        """Append ``record``; see ``_append`` for ``position``."""
+        return self._append([{"op": PUT, "listing": record}], position)
+
+    def put_many(
+        self, records: Iterable[dict], position: Optional[LogPosition] = None
+    ) -> Optional[LogPosition]:
+        """Append every record with a single write."""
+        entries = [{"op": PUT, "listing": record} for record in records]
+        return self._append(entries, position)
+
+    def delete(
+        self, listing_id: int, position: Optional[LogPosition] = None
+    ) -> Optional[LogPosition]:
+        return self._append([{"op": DELETE, "id": listing_id}], position)
+
+    def allocate_id(self) -> int:
+        """Next listing id, never handed out before by any process."""
+        return self.allocate_ids(1)[0]
+
+    def allocate_ids(self, count: int) -> range:
+        """``count`` consecutive ids, reserved in one step."""
+        with self._locked():
+            first = self._last_id() + 1
+            self._write_sequence(first + count - 1)
+        return range(first, first + count)
+
+    def replace_all(self, records: Iterable[dict]):
+        """Rewrite the snapshot with ``records`` and drop any pending log."""
+        records = list(records)
+        self._rewrite(lambda: records)
+
+    def checkpoint(self, generation: Optional[int] = None):
+        """Fold the whole log into a new snapshot now, and publish it.
+
+        With ``generation``, nothing is done once another generation has been
+        published, so readers racing to republish a rewrite do it only once.
+        """
+        self._rewrite(lambda: list(self.load()[0].values()), generation)
+
+    def generation(self) -> int:
+        """The last published generation, 0 before the first; no system call."""
+        if self._generation_map is None:
+            if not self.generation_path.exists():
+                return 0
+            with open(self.generation_path, "rb") as fp:
+                self._generation_map = mmap.mmap(
+                    fp.fileno(), GENERATION.size, access=mmap.ACCESS_READ
+                )
+        return GENERATION.unpack_from(self._generation_map)[0]
+
+    def published(self) -> Tuple[int, LogPosition]:
+        """The last published generation and the log position right after it.
+
+        ``tail`` from that position returns ``None`` once the snapshot has been
+        rewritten without being published.
+        """
+        with self._locked(exclusive=False):
+            if (generation := self.generation()) == 0:
+                return 0, LogPosition((None, None), None, 0)
+            _, *snapshot_signature = GENERATION.unpack_from(self._generation_map)
+        return generation, LogPosition((tuple(snapshot_signature), None), None, 0)
+
+    def compact(self, background: bool = True):
+        if self.publisher is not None:
+            self.checkpoint()
+            return
+        with self._locked():
+            if self._compacting():
+                return
+            if not self.compacting_path.exists():
+                if not self.log_path.exists():
+                    return
+                os.replace(self.log_path, self.compacting_path)
+            if not background:
+                self._compactor = None
+                self._fold_compacting_log()
+                return
+            self._compactor = threading.Thread(
+                target=self._fold_compacting_log, name="listing-compactor", daemon=True
+            )
+            self._compactor.start()
+
+    def wait_for_compaction(self):
+        if (compactor := self._compactor) is not None:
+            compactor.join()
+
+    def _compacting(self) -> bool:
+        return self._compactor is not None and self._compactor.is_alive()
+
+    @contextmanager
+    def _locked(self, exclusive: bool = True):
+        """Hold the thread lock and, outermost only, the cross-process lock.
+
+        Shared acquisitions skip the file lock while there is no data
+        directory yet, so reading an empty store creates nothing.
+        """
+        with self._lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                if exclusive or self.data_dir.exists():
+                    self.data_dir.mkdir(parents=True, exist_ok=True)
+                    fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                    fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                    self._lock_fd = fd
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_fd is not None:
+                    # closing the descriptor releases the flock
+                    os.close(self._lock_fd)
+                    self._lock_fd = None
+
+    def _rewrite(
+        self,
+        read_records: Callable[[], List[dict]],
+        generation: Optional[int] = None,
+    ):
+        while True:
+            self.wait_for_compaction()
+            with self._locked():
+                if self._compacting():
+                    continue
+                if generation is not None and self.generation() != generation:
+                    return
+                records = read_records()
+                last_id = max((x["id"] for x in records), default=0)
+                if last_id > self._last_id():
+                    self._write_sequence(last_id)
+                self._write_snapshot(records)
+                for path in (self.compacting_path, self.log_path):
+                    if path.exists():
+                        path.unlink()
+                self._publish(records)
+                return
+
+    def _publish(self, records: List[dict]):
+        if self.publisher is None:
+            return
+        generation = self.generation() + 1
+        self.publisher(records, generation)
+        record = GENERATION.pack(generation, *file_signature(self.snapshot_path))
+        if not self.generation_path.exists():
+            tmp_path = self._tmp_path(".generation")
+            tmp_path.write_bytes(record)
+            os.replace(tmp_path, self.generation_path)
+            return
+        # afterwards written in place, so every reader's mapping sees it
+        fd = os.open(self.generation_path, os.O_RDWR)
+        try:
+            os.pwrite(fd, record, 0)
+        finally:
+            os.close(fd)
+
+    def _last_id(self) -> int:
+        try:
+            with open(self.sequence_path, "r") as fp:
+                return int(fp.read())
+        except FileNotFoundError:
+            records, _ = self.load()
+            return max(records, default=0)
+
+    def _write_sequence(self, listing_id: int):
+        tmp_path = self._tmp_path(".seq")
+        with open(tmp_path, "w") as fp:
+            fp.write(str(listing_id))
+        os.replace(tmp_path, self.sequence_path)
+
+    def _append(
+        self, entries: List[dict], position: Optional[LogPosition] = None
+    ) -> Optional[LogPosition]:
+        """Append ``entries`` to the log in one write.
+
+        When ``position`` is where the log ended before the write, the
+        position right after it is returned, so a reader that applied the
+        entries itself does not replay them; otherwise ``None``.
+        """
+        if not entries:
+            return position
+        lines = "".join(json.dumps(entry) + "\n" for entry in entries).encode()
+        with self._locked():
+            self._ensure_snapshot()
+            base = self._base_signature()
+            with open(self.log_path, "a+b") as fp:
+                stat = os.fstat(fp.fileno())
+                start = drop_torn_line(fp.fileno(), stat.st_size)
+                fp.write(lines)
+            size = start + len(lines)
+            current = (
+                position is not None
+                and position.base == base
+                and position.log_inode in (None, stat.st_ino)
+                and position.log_offset == start
+            )
+        if size >= self.compact_threshold:
+            self.compact()
+        return LogPosition(base, stat.st_ino, size) if current else None
+
+    def _base_signature(self) -> Tuple[FileSignature, FileSignature]:
+        return (
+            file_signature(self.snapshot_path),
+            file_signature(self.compacting_path),
+        )
+
+    def _read_log(
+        self, log_inode: Optional[int], offset: int
+    ) -> Tuple[List[str], Optional[int], int]:
+        try:
+            fp = open(self.log_path, "rb")
+        except FileNotFoundError:
+            return [], log_inode, offset
+        with fp:
+            fp.seek(offset)
+            data = fp.read()
+            log_inode = os.fstat(fp.fileno()).st_ino
+        # Only consume complete lines so a torn append is picked up next time.
+        complete = data[: data.rfind(b"\n") + 1]
+        lines = complete.decode().splitlines(keepends=True)
+        return lines, log_inode, offset + len(complete)
+
+    def _ensure_snapshot(self):
+        if not self.snapshot_path.exists():
+            # carries a legacy JSON snapshot over before the log grows on it
+            self._write_snapshot(self._read_snapshot().values())
+
+    def _fold_compacting_log(self):
+        # Read and write unlocked so appends carry on, then commit only if no
+        # other process folded the log or replaced the snapshot meanwhile.
+        base = self._base_signature()
+        try:
+            records = self._read_snapshot()
+            self._replay_file(records, self.compacting_path)
+        except FileNotFoundError:
+            return
+        tmp_path = self._write_tmp(records.values(), ".bin.compact")
+        with self._locked():
+            if self._base_signature() != base:
+                tmp_path.unlink()
+                return
+            self._commit_snapshot(tmp_path)
+            self.compacting_path.unlink()
+
+    def _read_snapshot(self) -> Dict[int, dict]:
+        try:
+            records = snapshot.loads(self.snapshot_path.read_bytes())
+        except FileNotFoundError:
+            if not self.legacy_snapshot_path.exists():
+                return {}
+            with open(self.legacy_snapshot_path, "r") as fp:
+                records = [
+                    {
+                        **x,
+                        "market": snapshot.code_of(x.get("market")),
+                        "currency": snapshot.code_of(x.get("currency")),
+                    }
+                    for x in json.load(fp)
+                ]
+        return {x["id"]: x for x in records}
+
+    @staticmethod
+    def _replay_file(records: Dict[int, dict], path: Path):
+        if not path.exists():
+            return
+        with open(path, "r") as fp:
+            replay(records, fp)
+
+    def _write_snapshot(self, records: Iterable[dict]):
+        self._commit_snapshot(self._write_tmp(records))
+
+    def _commit_snapshot(self, tmp_path: Path):
+        os.replace(tmp_path, self.snapshot_path)
+        if self.legacy_snapshot_path.exists():
+            self.legacy_snapshot_path.unlink()
+
+    def _write_tmp(self, records: Iterable[dict], suffix: str = ".bin.tmp") -> Path:
+        # encoded first, so a record that does not fit the format leaves no file
+        data = snapshot.dumps(records)
+        tmp_path = self._tmp_path(suffix)
+        try:
+            with open(tmp_path, "wb") as fp:
+                fp.write(data)
+        except BaseException:
+            tmp_path.unlink()
+            raise
+        return tmp_path
+
+    def _tmp_path(self, suffix: str) -> Path:
+        """A fresh file next to the target, unique across writers."""
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        return self.data_dir / f"listing.{os.getpid()}.{threading.get_ident()}{suffix}"
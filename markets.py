@@ -1,16 +1,18 @@
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 
 from currencies import CurrencyEnum
 
 
 @dataclass
 class Market:
+    __slots__ = ("code", "name", "currency")
+
     code: str
     name: str
     currency: str
 
     def to_dict(self):
-        return asdict(self)
+        return {"code": self.code, "name": self.name, "currency": self.currency}
 
 
 class InvalidMarket(Exception):
@@ -41,6 +43,13 @@ class Markets:
     def get_all(cls):
         return cls.__ALL__
 
+    @classmethod
+    def resolve(cls, value) -> Market:
+        """The shared instance for a code or a ``to_dict`` mapping of one."""
+        if isinstance(value, dict):
+            return cls.__PER_CODE__.get(value["code"]) or Market(**value)
+        return cls.get_by_code(value)
+
     @classmethod
     def get_by_code(cls, code):
         if market := cls.__PER_CODE__.get(code):
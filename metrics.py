@@ -0,0 +1,241 @@
+"""In-process counters and latency histograms, rendered for Prometheus.
+
+Everything is recorded into ``REGISTRY`` and served as text at ``/metrics``.
+Label values are resolved to a series once, so recording a sample is a
+bisect and a few additions under a per-series lock:
+
+    with span("filter_listings"):
+        ...
+    LISTING_RELOADS.inc()
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# seconds; a request is expected to take from well under a millisecond up to
+# a few seconds for a full catalog export
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...], **extra) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values: str):
+        """The series for ``values``, created on first use."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        if (series := self._series.get(values)) is None:
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, series in sorted(self._series.items()):
+            yield from self._samples(values, series)
+
+    def _samples(self, values, series) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class _CounterSeries:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    @property
+    def value(self) -> float:
+        return self._default.value
+
+    def _samples(self, values, series) -> Iterator[str]:
+        labels = format_labels(self.labelnames, values)
+        yield f"{self.name}{labels} {format_value(series.value)}"
+
+
+class _HistogramSeries:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # one slot per bucket plus the +Inf bucket; cumulated when rendered
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ):
+        self.buckets = tuple(sorted(map(float, buckets)))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def _samples(self, values, series) -> Iterator[str]:
+        with series._lock:
+            counts, total = list(series.counts), series.sum
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), counts):
+            cumulative += count
+            le = bound if isinstance(bound, str) else format_value(bound)
+            labels = format_labels(self.labelnames, values, le=le)
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        labels = format_labels(self.labelnames, values)
+        yield f"{self.name}_sum{labels} {format_value(total)}"
+        yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Timer:
+    """Context manager observing its elapsed wall time into a histogram series."""
+
+    __slots__ = ("series", "start")
+
+    def __init__(self, series: _HistogramSeries):
+        self.series = series
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.series.observe(time.perf_counter() - self.start)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "listing_api_request_seconds", "Time spent handling a request.", ("endpoint",)
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "listing_api_stage_seconds",
+    "Time spent in one stage of handling a request.",
+    ("stage",),
+)
+RATES_CACHE_HITS = REGISTRY.counter(
+    "listing_api_rates_cache_hits_total",
+    "Exchange rate lookups served by a fresh cached snapshot.",
+)
+RATES_CACHE_MISSES = REGISTRY.counter(
+    "listing_api_rates_cache_misses_total",
+    "Exchange rate lookups that found no snapshot or a stale one.",
+)
+LISTING_RELOADS = REGISTRY.counter(
+    "listing_api_listing_reloads_total",
+    "Full reloads of the listing store into the repository.",
+)
+
+
+def span(stage: str) -> Timer:
+    return Timer(STAGE_SECONDS.labels(stage))
+
+
+def render() -> str:
+    return REGISTRY.render()
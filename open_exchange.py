@@ -1,31 +1,257 @@
+import json
 import os
-
-import requests
-from cachetools import TTLCache, cached
-from dotenv import load_dotenv
+import threading
+import time
+from dataclasses import dataclass, field
+from itertools import count
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Tuple, Union
 
 from currencies import Currencies, CurrencyEnum
+from metrics import RATES_CACHE_HITS, RATES_CACHE_MISSES, span
+
+if TYPE_CHECKING:  # pragma: no cover
+    import asyncio
+
+    import requests
 
 base_url = "https://openexchangerates.org/api"
 
-load_dotenv()
+DEFAULT_TIMEOUT = (3.05, 10)
+
+
+_snapshot_ids = count(1)
+_env_loaded = False
+
+
+def load_env():
+    """Load ``.env`` into the environment, once; dotenv is imported only here."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _env_loaded = True
+
+
+def optional_httpx():
+    """httpx, imported on first use, or None when it is not installed."""
+    try:
+        import httpx
+    except ImportError:  # pragma: no cover - httpx is optional
+        return None
+    return httpx
+
+
+@dataclass(frozen=True)
+class RatesSnapshot:
+    """One fetch of the USD table with every cross rate precomputed.
+
+    ``matrix[base][code]`` is the number of ``code`` per one ``base``.
+    """
+
+    matrix: Dict[str, Dict[str, float]]
+    fetched_at: float = field(default_factory=time.time)
+    id: int = field(default_factory=lambda: next(_snapshot_ids))
+
+    @classmethod
+    def from_usd(cls, usd_rates: Dict[str, float], **kwargs) -> "RatesSnapshot":
+        bases = {*usd_rates, *Currencies.codes()}
+        return cls(
+            matrix={base: convert_rate(usd_rates, base) for base in bases}, **kwargs
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RatesSnapshot":
+        return cls.from_usd(data["rates"], fetched_at=data["fetched_at"])
+
+    def to_dict(self) -> dict:
+        return {"rates": self.usd, "fetched_at": self.fetched_at}
+
+    @property
+    def usd(self) -> Dict[str, float]:
+        return self.matrix[CurrencyEnum.USD]
+
+    def age(self) -> float:
+        return max(time.time() - self.fetched_at, 0.0)
+
+    def rates_for(self, base_code: str) -> dict:
+        return self.matrix.get(base_code, {})
+
+
+class _Flight:
+    """An upstream fetch in progress that other callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[RatesSnapshot] = None
+
+
+class RatesClient:
+    """Open Exchange Rates client sharing one pooled ``requests.Session``.
+
+    Only the USD table is fetched; the snapshot built from it serves every
+    base currency. Readers always get the last good snapshot immediately: once
+    it is older than ``ttl`` seconds a refresh starts in the background, and a
+    failed refresh keeps the previous snapshot. Concurrent refreshes are
+    coalesced into one upstream call. With ``snapshot_path`` set, every good
+    snapshot is persisted there and reloaded on start.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        url: str = base_url,
+        ttl: float = 10,
+        timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+        session: Optional["requests.Session"] = None,
+        snapshot_path: Optional[Union[str, Path]] = None,
+    ):
+        self.api_key = api_key
+        self.url = url
+        self.timeout = timeout
+        self._session = session
+        self.ttl = ttl
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self._lock = threading.Lock()
+        self._flight: Optional[_Flight] = None
+        self._snapshot: Optional[RatesSnapshot] = self._load_snapshot()
+
+    @property
+    def session(self) -> "requests.Session":
+        # requests is only imported once the first upstream call is made
+        if self._session is None:
+            import requests
+
+            self._session = requests.Session()
+        return self._session
+
+    def latest_rates(self, base_code: str = CurrencyEnum.USD) -> dict:
+        if (snapshot := self.snapshot()) is None:
+            return {}
+        return snapshot.rates_for(base_code)
+
+    def snapshot(self) -> Optional[RatesSnapshot]:
+        if (snapshot := self._snapshot) is None:
+            RATES_CACHE_MISSES.inc()
+            return self.refresh()
+        if snapshot.age() >= self.ttl:
+            RATES_CACHE_MISSES.inc()
+            self.refresh(wait=False)
+        else:
+            RATES_CACHE_HITS.inc()
+        return snapshot
+
+    def refresh(self, wait: bool = True) -> Optional[RatesSnapshot]:
+        """Fetch a new snapshot, or join the fetch already in flight.
+
+        Returns the newest good snapshot, which is the previous one when the
+        fetch fails or when ``wait`` is false.
+        """
+        with self._lock:
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+        if leader and wait:
+            self._fly(flight)
+        elif leader:
+            threading.Thread(
+                target=self._fly, args=(flight,), name="rates-refresh", daemon=True
+            ).start()
+        if wait:
+            flight.done.wait()
+        return self._snapshot
+
+    def wait_for_refresh(self):
+        if (flight := self._flight) is not None:
+            flight.done.wait()
+
+    def install(self, usd_rates: dict) -> Optional[RatesSnapshot]:
+        """Replace the current snapshot with freshly fetched ``usd_rates``."""
+        if not usd_rates:
+            return None
+        snapshot = RatesSnapshot.from_usd(usd_rates)
+        self._snapshot = snapshot
+        self._save_snapshot(snapshot)
+        return snapshot
+
+    def request_args(self) -> dict:
+        load_env()
+        api_key = self.api_key or os.getenv("OPEN_EXCHANGE_API")
+        if not api_key:
+            raise Exception("Are you sure you set the OPEN_EXCHANGE_API env key")
+        codes = Currencies.codes()
+        return {
+            "url": f"{self.url}/latest.json",
+            "params": {"app_id": api_key, "symbols": ",".join(codes)},
+        }
+
+    def _fly(self, flight: _Flight):
+        try:
+            flight.result = self.install(self._fetch())
+        finally:
+            with self._lock:
+                self._flight = None
+            flight.done.set()
+
+    def _load_snapshot(self) -> Optional[RatesSnapshot]:
+        if self.snapshot_path is None or not self.snapshot_path.exists():
+            return None
+        try:
+            with open(self.snapshot_path, "r") as fp:
+                return RatesSnapshot.from_dict(json.load(fp))
+        except (ValueError, KeyError) as e:
+            print("UNABLE to load exchange rate snapshot", e)
+            return None
+
+    def _save_snapshot(self, snapshot: RatesSnapshot):
+        """Persist ``snapshot`` for the next start; a failed write is only logged."""
+        if self.snapshot_path is None:
+            return
+        # unique per writer, so concurrent workers never share a temporary file
+        tmp_path = self.snapshot_path.with_name(
+            f"{self.snapshot_path.stem}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w") as fp:
+                json.dump(snapshot.to_dict(), fp)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            print("UNABLE to save exchange rate snapshot", e)
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def _fetch(self) -> dict:
+        import requests
+
+        try:
+            with span("rates_fetch"):
+                resp = self.session.post(**self.request_args(), timeout=self.timeout)
+        except requests.RequestException as e:
+            print("UNABLE to get exchange rates", e)
+            return {}
+        if resp.ok:
+            return resp.json().get("rates", {})
+        print("UNABLE to get exchange rates", resp.status_code, resp.text)
+        return {}
+
+
+_default_client: Optional[RatesClient] = None
+_default_client_lock = threading.Lock()
+
+
+def default_rates_client() -> RatesClient:
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = RatesClient()
+        return _default_client
 
 
-@cached(cache=TTLCache(maxsize=2, ttl=10))
 def latest_rates(base_code: str = CurrencyEnum.USD) -> dict:
-    api_key = os.getenv("OPEN_EXCHANGE_API")
-    if not api_key:
-        raise Exception("Are you sure you set the OPEN_EXCHANGE_API env key")
-    codes = Currencies.codes()
-    resp = requests.post(
-        f"{base_url}/latest.json",
-        params={"app_id": api_key, "symbols": ",".join(codes)},
-    )
-    if resp.ok:
-        data = resp.json().get("rates", {})
-        return convert_rate(data, base_code)
-    print("UNABLE to get exchange rates", resp.status_code, resp.text)
-    return {}
+    return default_rates_client().latest_rates(base_code)
 
 
 def convert_rate(data: dict, base_code: str):
@@ -35,15 +261,148 @@ def convert_rate(data: dict, base_code: str):
     return data
 
 
+TESTING_RATES = {CurrencyEnum.USD: 1, CurrencyEnum.EUR: 0.94}
+
+
 class RateConverter:
-    def __init__(self, testing: bool):
+    def __init__(self, testing: bool, client: Optional[RatesClient] = None):
         self.testing = testing
+        self.client = client
+        self.refresher: Optional[RateRefresher] = None
+        self.history = None
 
     def latest_rates(self, base_code: str):
+        if (snapshot := self.snapshot()) is None:
+            return {}
+        return snapshot.rates_for(base_code)
+
+    def snapshot(self) -> Optional[RatesSnapshot]:
         if self.testing:
-            return {CurrencyEnum.USD: 1, CurrencyEnum.EUR: 0.94}
-        return latest_rates(base_code)
+            return RatesSnapshot(
+                matrix={code: TESTING_RATES for code in Currencies.codes()}, id=0
+            )
+        return (self.client or default_rates_client()).snapshot()
+
+    def rates_on(self, day, base_code: str) -> dict:
+        """Rates in effect on ``day`` from the local ``RateHistory``."""
+        if self.history is None:
+            raise LookupError("no historical exchange rates loaded")
+        return self.history.rates_for(day, base_code)
+
+    def currency_factors_on(self, start, days: int, listing_code: str, code: str):
+        if self.history is None:
+            raise LookupError("no historical exchange rates loaded")
+        return self.history.currency_factors(start, days, listing_code, code)
+
+
+class RateRefresher:
+    """Daemon thread refreshing a ``RatesClient`` every ``interval`` seconds."""
+
+    def __init__(self, client: RatesClient, interval: float):
+        self.client = client
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="rates-refresher", daemon=True
+        )
+
+    def start(self) -> "RateRefresher":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            try:
+                self.client.refresh()
+            except Exception as e:
+                print("UNABLE to refresh exchange rates", e)
+            if self._stop.wait(self.interval):
+                return
+
+
+class AsyncRateRefresher:
+    """asyncio task refreshing a ``RatesClient`` every ``interval`` seconds.
+
+    Uses ``httpx.AsyncClient`` so the event loop never blocks on the upstream
+    call; without httpx the blocking client runs in a worker thread instead.
+    asyncio itself is imported by the methods, so the WSGI app never loads it.
+    """
+
+    def __init__(self, client: RatesClient, interval: float):
+        self.client = client
+        self.interval = interval
+        self._task: Optional["asyncio.Task"] = None
+
+    async def refresh(self, http=None) -> Optional[RatesSnapshot]:
+        import asyncio
+
+        if (httpx := optional_httpx()) is None:
+            return await asyncio.to_thread(self.client.refresh)
+        connect, read = self.client.timeout
+        timeout = httpx.Timeout(read, connect=connect)
+        try:
+            with span("rates_fetch"):
+                if http is None:
+                    async with httpx.AsyncClient(timeout=timeout) as http:
+                        resp = await http.post(**self.client.request_args())
+                else:
+                    resp = await http.post(
+                        **self.client.request_args(), timeout=timeout
+                    )
+        except httpx.HTTPError as e:
+            print("UNABLE to get exchange rates", e)
+            return None
+        if resp.is_success:
+            return self.client.install(resp.json().get("rates", {}))
+        print("UNABLE to get exchange rates", resp.status_code, resp.text)
+        return None
+
+    def start(self) -> "AsyncRateRefresher":
+        import asyncio
+
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def stop(self):
+        import asyncio
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        import asyncio
+
+        httpx = optional_httpx()
+        http = httpx.AsyncClient() if httpx is not None else None
+        try:
+            while True:
+                try:
+                    await self.refresh(http)
+                except Exception as e:
+                    print("UNABLE to refresh exchange rates", e)
+                await asyncio.sleep(self.interval)
+        finally:
+            if http is not None:
+                await http.aclose()
 
 
-def get_rate_converter(testing):
-    return RateConverter(testing)
+def get_rate_converter(
+    testing,
+    snapshot_path: Optional[Union[str, Path]] = None,
+    refresh_interval: Optional[float] = None,
+):
+    if testing:
+        return RateConverter(testing)
+    client = RatesClient(snapshot_path=snapshot_path)
+    converter = RateConverter(testing, client)
+    if refresh_interval:
+        converter.refresher = RateRefresher(client, refresh_interval).start()
+    return converter
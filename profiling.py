@@ -0,0 +1,196 @@
+"""Opt-in request profiling, kept in a bounded on-disk ring buffer.
+
+A request is profiled when ``PROFILING`` is configured, or when it carries a
+``X-Profile`` header equal to the configured ``PROFILING_TOKEN``. The handler
+runs under pyinstrument's sampling profiler when it is installed, otherwise
+under ``cProfile``. Only profiles of requests slower than
+``PROFILE_THRESHOLD_MS`` are kept, and only the newest ``PROFILES_KEEP`` of
+them. They are listed and downloaded with the same token:
+
+    curl -H "X-Profile: $TOKEN" localhost:5000/profiles
+    curl -H "X-Profile: $TOKEN" localhost:5000/profiles/<name> -o out.prof
+
+``.prof`` files are ``pstats`` dumps; ``.html`` files are pyinstrument reports.
+"""
+
+import hmac
+import marshal
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Mapping, Optional, Union
+
+try:
+    import pyinstrument
+except ImportError:  # pragma: no cover - pyinstrument is optional
+    pyinstrument = None
+
+PROFILE_HEADER = "X-Profile"
+DEFAULT_THRESHOLD_MS = 500
+DEFAULT_KEEP = 50
+
+PROFILE_NAME = re.compile(
+    r"^(?P<created_ns>\d+)-(?P<pid>\d+)-(?P<endpoint>[\w.]+)"
+    r"-(?P<duration_us>\d+)us\.(?P<format>prof|html)$"
+)
+
+
+def is_admin(headers: Mapping[str, str], token: Optional[str]) -> bool:
+    """Whether ``headers`` carry the profiling token; never without a token."""
+    if not token or (given := headers.get(PROFILE_HEADER)) is None:
+        return False
+    return hmac.compare_digest(given.encode(), token.encode())
+
+
+@dataclass(frozen=True)
+class ProfileEntry:
+    name: str
+    endpoint: str
+    duration_ms: float
+    created_at: float
+    size: int
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "endpoint": self.endpoint,
+            "duration_ms": self.duration_ms,
+            "created_at": self.created_at,
+            "size": self.size,
+        }
+
+
+class ProfileStore:
+    """The newest ``keep`` profiles in ``directory``; older ones are deleted.
+
+    Names start with the creation time in nanoseconds, so every process
+    writing to the same directory agrees on which profiles are the oldest.
+    """
+
+    def __init__(self, directory: Union[str, Path], keep: int = DEFAULT_KEEP):
+        self.directory = Path(directory)
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def save(self, data: bytes, endpoint: str, duration: float, fmt: str) -> str:
+        endpoint = re.sub(r"[^\w.]", "_", endpoint)
+        name = (
+            f"{time.time_ns()}-{os.getpid()}-{endpoint}"
+            f"-{int(duration * 1e6)}us.{fmt}"
+        )
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.directory / f".{name}.tmp"
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, self.directory / name)
+        self._prune()
+        return name
+
+    def entries(self) -> List[ProfileEntry]:
+        """Saved profiles, newest first."""
+        if not self.directory.exists():
+            return []
+        entries = []
+        for name in sorted(self._names(), reverse=True):
+            match = PROFILE_NAME.match(name)
+            try:
+                size = (self.directory / name).stat().st_size
+            except FileNotFoundError:
+                continue
+            entries.append(
+                ProfileEntry(
+                    name=name,
+                    endpoint=match["endpoint"],
+                    duration_ms=int(match["duration_us"]) / 1000,
+                    created_at=int(match["created_ns"]) / 1e9,
+                    size=size,
+                )
+            )
+        return entries
+
+    def read(self, name: str) -> Optional[bytes]:
+        """The profile called ``name``; anything not named like one is missing."""
+        if not PROFILE_NAME.match(name):
+            return None
+        try:
+            return (self.directory / name).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _names(self) -> List[str]:
+        return [
+            entry.name
+            for entry in os.scandir(self.directory)
+            if PROFILE_NAME.match(entry.name)
+        ]
+
+    def _prune(self):
+        with self._lock:
+            for name in sorted(self._names())[: -self.keep or None]:
+                try:
+                    os.unlink(self.directory / name)
+                except FileNotFoundError:
+                    pass  # pruned by another process
+
+
+# One request is profiled at a time: on Python 3.12+ cProfile refuses to enable a
+# second profiler while one is active, and samples of overlapping requests
+# would be mixed up anyway.
+_profiling = threading.Lock()
+
+
+class RequestProfiler:
+    """Profiles one request on the calling thread."""
+
+    @classmethod
+    def start(cls) -> Optional["RequestProfiler"]:
+        """A running profiler, or ``None`` while another request is profiled."""
+        if not _profiling.acquire(blocking=False):
+            return None
+        try:
+            profiler = cls()
+        except ValueError:
+            # on 3.12+, a profiler outside this module is active
+            _profiling.release()
+            return None
+        except BaseException:
+            _profiling.release()
+            raise
+        profiler._releases = True
+        return profiler
+
+    def __init__(self):
+        self._releases = False
+        self.started = time.perf_counter()
+        if pyinstrument is not None:  # pragma: no cover - pyinstrument is optional
+            self.format = "html"
+            self._profiler = pyinstrument.Profiler(async_mode="disabled")
+            self._profiler.start()
+        else:
+            # imported here so nothing profiling related loads while it is off
+            import cProfile
+
+            self.format = "prof"
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self.duration: Optional[float] = None
+
+    def stop(self) -> float:
+        if self.duration is None:
+            if self.format == "html":  # pragma: no cover - pyinstrument is optional
+                self._profiler.stop()
+            else:
+                self._profiler.disable()
+            self.duration = time.perf_counter() - self.started
+            if self._releases:
+                _profiling.release()
+        return self.duration
+
+    def output(self) -> bytes:
+        if self.format == "html":  # pragma: no cover - pyinstrument is optional
+            return self._profiler.output_html().encode()
+        # the same bytes ``cProfile.Profile.dump_stats`` writes to a file
+        self._profiler.create_stats()
+        return marshal.dumps(self._profiler.stats)
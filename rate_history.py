@@ -0,0 +1,170 @@
+"""Daily exchange rates kept in a compact, memory-mapped file.
+
+The file holds one row of USD rates per day, one float64 column per currency:
+
+    header   "<4sHHII" magic, version, currency count, first day ordinal, days
+    codes    8 ascii bytes per currency
+    rows     days * currencies float64
+
+Build it from Open Exchange Rates historical files (``YYYY-MM-DD.json``) with
+
+    python -m rate_history data/rates_history.bin historical/*.json
+"""
+
+import argparse
+import json
+import math
+import mmap
+import struct
+from datetime import date, datetime, timedelta, timezone
+from itertools import count
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+from currencies import Currencies
+from open_exchange import convert_rate
+
+MAGIC = b"RTHS"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+CODE_WIDTH = 8
+
+_history_ids = count(1)
+
+
+class RateHistory:
+    """O(1) lookup of the USD rates in effect on a day, per currency.
+
+    Days between two known days carry the earlier rates forward, and days after
+    the last known day use the last rates; days before the first raise
+    ``KeyError``.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.id = next(_history_ids)
+        with open(self.path, "rb") as fp:
+            self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, currencies, first_day, days = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} rate history")
+        codes_end = HEADER.size + currencies * CODE_WIDTH
+        self.codes = [
+            self._mmap[offset : offset + CODE_WIDTH].rstrip(b"\0").decode()
+            for offset in range(HEADER.size, codes_end, CODE_WIDTH)
+        ]
+        self._column = {code: i for i, code in enumerate(self.codes)}
+        self.first_day = date.fromordinal(first_day)
+        self.days = days
+        self._rows = memoryview(self._mmap)[codes_end:].cast("d")
+
+    @property
+    def last_day(self) -> date:
+        return date.fromordinal(self.first_day.toordinal() + self.days - 1)
+
+    def rate(self, day: date, code: str) -> Optional[float]:
+        """USD rate of ``code`` on ``day``, or ``None`` for an unknown currency."""
+        if (column := self._column.get(code)) is None:
+            return None
+        value = self._rows[self._row(day) + column]
+        return None if math.isnan(value) else value
+
+    def usd_rates(self, day: date) -> Dict[str, float]:
+        row = self._row(day)
+        return {
+            code: value
+            for code, value in zip(self.codes, self._rows[row : row + len(self.codes)])
+            if not math.isnan(value)
+        }
+
+    def rates_for(self, day: date, base_code: str) -> dict:
+        return convert_rate(self.usd_rates(day), base_code)
+
+    def currency_factors(
+        self, start: date, days: int, listing_code: str, code: str
+    ) -> List[float]:
+        """Per day, how many ``listing_code`` one ``code`` bought.
+
+        Matches ``rates_for(day, code).get(listing_code, 1)`` for each day.
+        """
+        listing_column = self._column.get(listing_code)
+        column = None if code == "USD" else self._column.get(code)
+        factors = []
+        for day in range(days):
+            row = self._row(start + timedelta(days=day))
+            if listing_column is None or math.isnan(
+                listing_rate := self._rows[row + listing_column]
+            ):
+                factors.append(1)
+            elif column is None or math.isnan(rate := self._rows[row + column]):
+                factors.append(listing_rate)
+            else:
+                factors.append(listing_rate / rate)
+        return factors
+
+    def close(self):
+        self._rows.release()
+        self._mmap.close()
+
+    def _row(self, day: date) -> int:
+        offset = day.toordinal() - self.first_day.toordinal()
+        if offset < 0 or self.days == 0:
+            raise KeyError(f"no exchange rates before {self.first_day.isoformat()}")
+        return min(offset, self.days - 1) * len(self.codes)
+
+    @classmethod
+    def build(
+        cls, path: Union[str, Path], daily: Dict[date, Dict[str, float]]
+    ) -> "RateHistory":
+        """Write ``daily`` USD rates to ``path``, filling gaps forward."""
+        codes = sorted(
+            {
+                *map(str, Currencies.codes()),
+                *(c for rates in daily.values() for c in rates),
+            }
+        )
+        first = min(daily).toordinal() if daily else date.today().toordinal()
+        days = max(daily).toordinal() - first + 1 if daily else 0
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as fp:
+            fp.write(HEADER.pack(MAGIC, VERSION, len(codes), first, days))
+            for code in codes:
+                fp.write(code.encode().ljust(CODE_WIDTH, b"\0")[:CODE_WIDTH])
+            row = [math.nan] * len(codes)
+            for ordinal in range(first, first + days):
+                rates = daily.get(date.fromordinal(ordinal), {})
+                row = [rates.get(code, previous) for code, previous in zip(codes, row)]
+                fp.write(struct.pack(f"<{len(codes)}d", *row))
+        return cls(path)
+
+    @classmethod
+    def from_bulk_files(
+        cls, path: Union[str, Path], files: Iterable[Union[str, Path]]
+    ) -> "RateHistory":
+        daily = {}
+        for file in map(Path, files):
+            with open(file, "r") as fp:
+                data = json.load(fp)
+            if "timestamp" in data:
+                day = datetime.fromtimestamp(data["timestamp"], tz=timezone.utc).date()
+            else:
+                day = date.fromisoformat(file.stem)
+            rates = data["rates"]
+            if data.get("base", "USD") != "USD":
+                rates = {code: rate / rates["USD"] for code, rate in rates.items()}
+            daily[day] = rates
+        return cls.build(path, daily)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a rate history file.")
+    parser.add_argument("output")
+    parser.add_argument("files", nargs="+")
+    args = parser.parse_args()
+    history = RateHistory.from_bulk_files(args.output, args.files)
+    print(f"{history.days} days, {len(history.codes)} currencies -> {history.path}")
+
+
+if __name__ == "__main__":
+    main()
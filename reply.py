@@ -0,0 +1,123 @@
+import codecs
+import dataclasses
+import json
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Union
+
+from metrics import span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+JSON_MIMETYPE = "application/json"
+
+ORJSON_OPTIONS = (
+    orjson.OPT_SORT_KEYS
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    if orjson is not None
+    else 0
+)
+# Floats orjson writes differently from ``repr``: exponents ("1e16", "1.5e-7")
+# and fixed notation below 1e-4 ("0.00001"). Digits are folded to "0" first so
+# a few substring tests find them; matches inside strings are harmless false
+# positives that only take the slow path.
+DIGITS_TO_ZERO = bytes.maketrans(b"123456789", b"000000000")
+EXPONENTS = (b"0e0", b"0e-")
+SMALL_FIXED = b"0.0000"
+
+
+def default(o):
+    if hasattr(o, "to_dict"):
+        return o.to_dict()
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+@lru_cache(maxsize=1024)
+def _escape(run: str) -> str:
+    return json.dumps(run)[1:-1]
+
+
+def _ensure_ascii(error: UnicodeEncodeError):
+    return _escape(error.object[error.start : error.end]), error.end
+
+
+codecs.register_error("reply.ensure_ascii", _ensure_ascii)
+
+
+def _float_drift(data: bytes) -> bool:
+    if SMALL_FIXED in data:
+        return True
+    folded = data.translate(DIGITS_TO_ZERO)
+    return any(exponent in folded for exponent in EXPONENTS)
+
+
+def stdlib_dumpb(obj) -> bytes:
+    return json.dumps(
+        obj, default=default, ensure_ascii=True, sort_keys=True, separators=(",", ":")
+    ).encode()
+
+
+def dumpb(obj) -> bytes:
+    """Encode ``obj`` exactly like Flask's ``jsonify`` outside debug mode.
+
+    Uses orjson when it is installed, escapes non-ASCII the way the stdlib
+    does, and hands over to the stdlib encoder whenever orjson would format a
+    float differently. The exception is NaN and infinities, which orjson
+    writes as ``null`` instead of the non-standard ``NaN``/``Infinity``;
+    listings never hold them, as ``validate_price`` rejects them.
+    """
+    if orjson is None:
+        return stdlib_dumpb(obj)
+    try:
+        data = orjson.dumps(obj, default=default, option=ORJSON_OPTIONS)
+    except orjson.JSONEncodeError:
+        # integers past 64 bits, non-string keys, or a genuine TypeError that
+        # the stdlib encoder raises in its own words
+        return stdlib_dumpb(obj)
+    if _float_drift(data) or b"\x7f" in data:
+        return stdlib_dumpb(obj)
+    if not data.isascii():
+        data = data.decode().encode("ascii", "reply.ensure_ascii")
+    return data
+
+
+def dumps(obj) -> str:
+    return dumpb(obj).decode()
+
+
+def loads(data: Union[bytes, str]):
+    if orjson is None:
+        return json.loads(data)
+    return orjson.loads(data)
+
+
+@dataclass
+class Reply:
+    """A framework independent response produced by the request handlers.
+
+    ``body`` is either the encoded bytes or an iterable of chunks to stream.
+    The Flask app and the ASGI app both turn it into their own response type.
+    """
+
+    body: Union[bytes, str, Iterable[str]]
+    status: int = 200
+    headers: Dict[str, str] = field(default_factory=dict)
+    mimetype: str = JSON_MIMETYPE
+
+    @property
+    def streamed(self) -> bool:
+        return not isinstance(self.body, (bytes, str))
+
+
+def json_reply(
+    data: Any, status: int = 200, headers: Optional[Dict[str, str]] = None
+) -> Reply:
+    with span("encode_json"):
+        body = dumpb(data) + b"\n"
+    return Reply(body, status, dict(headers or {}))
@@ -0,0 +1,45 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from app import create_app, listing_repository, warm_up
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_import_defers_optional_dependencies():
+    code = (
+        "import sys, app; "
+        "print(sorted({'requests', 'httpx', 'numpy', 'dotenv', 'asyncio', 'cProfile'}"
+        " & set(sys.modules)))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True
+    )
+    assert proc.stdout.strip() == "[]", proc.stderr
+
+
+def test_rate_converter_built_on_first_use(tmp_path):
+    app = create_app({"TESTING": True, "BASE_DIR": tmp_path})
+    client = app.test_client()
+    assert client.get("/markets").status_code == 200
+    assert app._rate_converter is None
+    assert client.get("/rates/status").json["snapshot_id"] == 0
+    assert app.rate_converter is app._rate_converter
+
+
+def test_apps_are_independent(tmp_path, persisted_listings):
+    first = create_app({"TESTING": True, "BASE_DIR": tmp_path})
+    second = create_app({"TESTING": True, "BASE_DIR": tmp_path / "empty"})
+    assert len(first.test_client().get("/listings").json) == 4
+    assert second.test_client().get("/listings").json == []
+    assert first.calendar_cache is not second.calendar_cache
+
+
+def test_warm_up_loads_store(tmp_path, persisted_listings):
+    app = create_app({"TESTING": True, "BASE_DIR": tmp_path})
+    warm_up(app)
+    with app.app_context():
+        repository = listing_repository()
+        assert repository._position is not None
+        assert len(repository) == 4
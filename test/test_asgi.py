@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from asgi import application  # noqa: E402
+
+
+def asgi_request(method, url, **kwargs):
+    async def send():
+        transport = httpx.ASGITransport(app=application)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as http:
+            return await http.request(method, url, **kwargs)
+
+    return asyncio.run(send())
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/markets",
+        "/listings",
+        "/listings?market=paris&base_price.lt=300&currency=EUR",
+        "/listings?limit=2",
+        "/listings?stream=true",
+        "/listings?base_price.gt=4",
+        "/listings/1",
+        "/listings/1/calendar",
+        "/listings/1/calendar?currency=eur",
+        "/listings/100",
+        "/listings/export",
+        "/calendars?ids=1,2,100&currency=EUR",
+        "/listings?market=mars",
+    ],
+)
+def test_get_matches_flask(client, persisted_listings, url):
+    expected = client.get(url)
+    resp = asgi_request("GET", url)
+    assert resp.status_code == expected.status_code
+    assert resp.content == expected.data
+    assert resp.headers["content-type"] == expected.headers["Content-Type"]
+    assert resp.headers.get("x-next-cursor") == expected.headers.get("X-Next-Cursor")
+
+
+def test_write_requests(client, persisted_listings, simple_listing):
+    resp = asgi_request("POST", "/listings", json=simple_listing)
+    assert resp.status_code == 200
+    new_id = resp.json()["id"]
+    assert client.get(f"/listings/{new_id}").json == resp.json()
+
+    resp = asgi_request("PUT", f"/listings/{new_id}", json={"base_price": 42})
+    assert resp.status_code == 200
+    assert client.get(f"/listings/{new_id}").json["base_price"] == 42
+
+    resp = asgi_request("DELETE", f"/listings/{new_id}")
+    assert resp.status_code == 200
+    assert resp.text == "success"
+    assert client.get(f"/listings/{new_id}").status_code == 422
+
+
+def test_bulk_import(client, simple_listing):
+    body = f"{json.dumps(simple_listing)}\n{{\n"
+    resp = asgi_request(
+        "POST",
+        "/listings/bulk",
+        content=body.encode(),
+        headers={"content-type": "application/x-ndjson"},
+    )
+    assert resp.json() == {
+        "created": [{"id": 1, "row": 0}],
+        "errors": [{"message": "unable to parse row", "row": 1}],
+    }
+
+
+def test_invalid_body_rejected(client):
+    resp = asgi_request(
+        "POST", "/listings", content=b"{", headers={"content-type": "application/json"}
+    )
+    assert resp.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "method, url, status", [("GET", "/nowhere", 404), ("PATCH", "/listings/1", 405)]
+)
+def test_unknown_routes(client, method, url, status):
+    assert asgi_request(method, url).status_code == status
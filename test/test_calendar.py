@@ -22,3 +22,35 @@ def test_calendar_date_range(client, persisted_listings):
     now = datetime.now().date()
     assert min(dates).isoformat() == now.isoformat()
     assert len(data) == 365, "365 days in dataset"
+
+
+def test_calendar_window(client, persisted_listings):
+    resp = client.get("/listings/1/calendar?start=2030-01-01&end=2030-01-30")
+    data = resp.json
+    assert len(data) == 30
+    assert (data[0]["date"], data[-1]["date"]) == ("2030-01-01", "2030-01-30")
+
+
+@pytest.mark.parametrize("granularity, periods", [("week", 10), ("month", 3)])
+def test_calendar_granularity(client, persisted_listings, granularity, periods):
+    window = "start=2030-01-01&end=2030-03-06"
+    daily = client.get(f"/listings/3/calendar?currency=USD&{window}").json
+    resp = client.get(
+        f"/listings/3/calendar?currency=USD&{window}&granularity={granularity}"
+    )
+    assert resp.status_code == 200
+    data = resp.json
+    assert len(data) == periods
+    assert sum(row["days"] for row in data) == len(daily) == 65
+    assert min(row["min"] for row in data) == min(row["price"] for row in daily)
+    total = sum(row["price"] for row in daily)
+    assert sum(row["sum"] for row in data) == pytest.approx(total)
+    assert len(resp.data) < len(client.get("/listings/3/calendar").data) / 10
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["granularity=year", "start=2030-01-01&end=2029-12-31", "end=nope"],
+)
+def test_invalid_calendar_window(client, persisted_listings, query):
+    assert client.get(f"/listings/1/calendar?{query}").status_code == 422
@@ -1,12 +1,16 @@
-from datetime import date
+from datetime import date, datetime, timedelta
 
 import pytest
 from calendar_api import (
     build_calendar,
+    build_calendar_summary,
     calendar_lookup,
+    calendar_table,
     default_calendar,
     paris_calendar,
+    periods,
     san_fran_calendar,
+    weekday_counts,
 )
 from markets import Markets
 
@@ -16,6 +20,28 @@ def test_build_calendar(listing):
     assert len(q) == 365
 
 
+def test_build_calendar_prices(listing):
+    rows = list(build_calendar(listing, 0.5, "EUR"))
+    start = datetime.now().date()
+    for day, row in enumerate(rows):
+        dt = start + timedelta(days=day)
+        assert row == {
+            "date": dt.isoformat(),
+            "price": (listing.base_price * san_fran_calendar(dt)) / 0.5,
+            "currency": "EUR",
+        }
+
+
+def test_calendar_table_is_cached_per_day():
+    today = date(2022, 1, 1)
+    table = calendar_table(paris_calendar, today)
+    assert calendar_table(paris_calendar, today) is table
+    tomorrow = calendar_table(paris_calendar, today + timedelta(days=1))
+    assert tomorrow.dates[0] == "2022-01-02"
+    assert tomorrow.dates[:-1] == table.dates[1:]
+    assert set(table.distinct_multipliers) == {1, 1.5}
+
+
 def test_lookup_has_all_markets():
     assert not (
         calendar_lookup.keys() - Markets.__PER_CODE__.keys()
@@ -35,3 +61,59 @@ def test_paris_calendar(dt, expected):
 @pytest.mark.parametrize("dt,expected", (("2022-01-01", 1), ("2022-01-07", 1.25)))
 def test_default_calendar(dt, expected):
     assert default_calendar(date.fromisoformat(dt)) == expected
+
+
+@pytest.mark.parametrize("days", [1, 6, 7, 8, 30, 365])
+def test_weekday_counts(days):
+    start = date(2022, 1, 5)
+    counts = weekday_counts(start, days)
+    expected = [0] * 7
+    for day in range(days):
+        expected[(start + timedelta(days=day)).weekday()] += 1
+    assert counts == expected
+
+
+@pytest.mark.parametrize("granularity", ["week", "month"])
+def test_periods_cover_window(granularity):
+    start = date(2022, 1, 30)
+    spans = list(periods(start, 100, granularity))
+    assert spans[0][0] == start
+    assert sum(days for _, days in spans) == 100
+    for (first, days), (following, _) in zip(spans, spans[1:]):
+        assert first + timedelta(days=days) == following
+        if granularity == "week":
+            assert following.weekday() == 0
+        else:
+            assert following.day == 1
+
+
+@pytest.mark.parametrize("granularity", ["week", "month"])
+def test_summary_matches_daily_rows(random_listings, granularity):
+    start = date(2022, 3, 17)
+    for listing in random_listings[:30]:
+        rows = list(build_calendar(listing, 0.94, "EUR", start, days=200))
+        summaries = list(
+            build_calendar_summary(listing, 0.94, "EUR", start, 200, granularity)
+        )
+        offset = 0
+        for summary in summaries:
+            prices = [row["price"] for row in rows[offset : offset + summary["days"]]]
+            assert summary["start"] == rows[offset]["date"]
+            offset += summary["days"]
+            assert summary["end"] == rows[offset - 1]["date"]
+            assert summary["min"] == min(prices)
+            assert summary["max"] == max(prices)
+            assert summary["sum"] == pytest.approx(sum(prices))
+            assert summary["mean"] == pytest.approx(sum(prices) / len(prices))
+        assert offset == 200
+
+
+def test_summary_with_daily_factors(listing):
+    start = date(2022, 1, 1)
+    factors = [1 + day / 100 for day in range(14)]
+    rows = list(build_calendar(listing, 1, "EUR", start, factors, days=14))
+    summaries = list(
+        build_calendar_summary(listing, 1, "EUR", start, 14, "week", factors)
+    )
+    assert [s["days"] for s in summaries] == [2, 7, 5]
+    assert summaries[1]["sum"] == pytest.approx(sum(row["price"] for row in rows[2:9]))
@@ -0,0 +1,58 @@
+from datetime import date
+
+from app import app
+from calendar_cache import CalendarCache, CalendarKey
+
+
+def key(listing_id, version=1, currency="USD"):
+    return CalendarKey(listing_id, version, currency, (), date(2022, 1, 1))
+
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = CalendarCache(budget=10)
+    cache.put(key(1), b"aaaa")
+    cache.put(key(2), b"bbbb")
+    assert cache.get(key(1)) == b"aaaa"
+    cache.put(key(3), b"cccc")
+    assert cache.get(key(2)) is None, "least recently used entry evicted"
+    assert cache.get(key(1)) == b"aaaa"
+    assert cache.size == 8
+
+
+def test_oversized_body_is_not_cached():
+    cache = CalendarCache(budget=2)
+    cache.put(key(1), b"abc")
+    assert len(cache) == 0
+
+
+def test_invalidate_listing():
+    cache = CalendarCache()
+    cache.put(key(1, currency="USD"), b"usd")
+    cache.put(key(1, currency="EUR"), b"eur")
+    cache.put(key(2), b"other")
+    cache.invalidate(1)
+    assert len(cache) == 1
+    assert cache.size == len(b"other")
+
+
+def test_calendar_served_from_cache(client, persisted_listings):
+    first = client.get("/listings/1/calendar?currency=EUR")
+    assert len(app.calendar_cache) == 1
+    second = client.get("/listings/1/calendar?currency=EUR")
+    assert second.status_code == 200
+    assert second.get_data() == first.get_data()
+    assert second.mimetype == "application/json"
+
+
+def test_update_invalidates_cached_calendar(client, persisted_listings):
+    before = client.get("/listings/1/calendar").json
+    client.put("/listings/1", json={"base_price": 200})
+    after = client.get("/listings/1/calendar").json
+    assert {row["price"] for row in after} == {row["price"] * 2 for row in before}
+
+
+def test_delete_invalidates_cached_calendar(client, persisted_listings):
+    client.get("/listings/1/calendar")
+    client.delete("/listings/1")
+    assert len(app.calendar_cache) == 0
+    assert client.get("/listings/1/calendar").status_code == 422
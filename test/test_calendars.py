@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+
+import pytest
+
+
+def test_get_matches_single_calendars(client, persisted_listings):
+    resp = client.get("/calendars?ids=1,3,100")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.json == [
+        {"id": 1, "calendar": client.get("/listings/1/calendar").json},
+        {"id": 3, "calendar": client.get("/listings/3/calendar").json},
+        {"id": 100, "error": "unable to find listing"},
+    ]
+
+
+def test_post_in_currency(client, persisted_listings):
+    resp = client.post("/calendars", json={"ids": [3, 1], "currency": "USD"})
+    assert [item["id"] for item in resp.json] == [3, 1]
+    for item in resp.json:
+        single = client.get(f"/listings/{item['id']}/calendar?currency=USD").json
+        assert item["calendar"] == single
+
+
+def test_date_window(client, persisted_listings):
+    start = date(2030, 1, 1)
+    resp = client.post(
+        "/calendars", json={"ids": [1], "start": "2030-01-01", "end": "2030-01-31"}
+    )
+    calendar = resp.json[0]["calendar"]
+    assert len(calendar) == 31
+    assert calendar[0]["date"] == start.isoformat()
+    assert calendar[-1]["date"] == (start + timedelta(days=30)).isoformat()
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "",
+        "?ids=",
+        "?ids=1,a",
+        "?ids=1&currency=XXX",
+        "?ids=1&start=2030-01-02&end=2030-01-01",
+        "?ids=1&start=2030-01-01&end=2031-01-01",
+        "?ids=" + ",".join(["1"] * 5001),
+    ],
+)
+def test_invalid_requests(client, persisted_listings, query):
+    resp = client.get(f"/calendars{query}")
+    assert resp.status_code == 422
+
+
+def test_post_requires_object(client):
+    assert client.post("/calendars", json=[1, 2]).status_code == 422
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"ids": [1], "start": 20300101},
+        {"ids": [1], "end": [2030, 1, 2]},
+        {"ids": [1], "currency": ["EUR"]},
+        {"ids": [1], "currency": {"code": "EUR"}},
+    ],
+)
+def test_post_rejects_non_string_values(client, persisted_listings, body):
+    assert client.post("/calendars", json=body).status_code == 422
@@ -0,0 +1,61 @@
+from dataclasses import replace
+
+import pytest
+from listing.api import filter_listings
+from listing.model import Listing
+from listing.repository import ListingRepository
+from listing.shared import SharedListingRepository
+from listing.store import ListingStore
+from markets import Markets
+from open_exchange import get_rate_converter
+
+
+@pytest.fixture(params=["index", "columnar", "shared"])
+def repository(request, tmp_path, random_listings):
+    Listing.write_to_file(random_listings, tmp_path)
+    store = ListingStore(tmp_path)
+    if request.param == "shared":
+        return SharedListingRepository(store)
+    if request.param == "columnar":
+        # without NumPy the columnar repository is the index one again
+        pytest.importorskip("numpy")
+    return ListingRepository(store, columnar=request.param == "columnar")
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"market": "paris,lisbon"},
+        {"market": "nowhere"},
+        {"base_price.gte": "100", "currency": "USD"},
+        {"market": "paris,lisbon", "base_price.gte": "100", "currency": "USD"},
+        {"base_price.gt": "50", "base_price.lte": "150", "currency": "EUR"},
+        {"base_price.e": "94", "currency": "USD"},
+        {"base_price.lt": "20", "market": "tokyo,unknown", "currency": "EUR"},
+    ],
+)
+def test_query_matches_full_scan(repository, random_listings, params):
+    rate_converter = get_rate_converter(True)
+    scanned = list(filter_listings(random_listings, params, rate_converter))
+    queried = filter_listings(repository, params, rate_converter)
+    assert [x.id for x in queried] == [x.id for x in scanned]
+    paged = filter_listings(repository, params, rate_converter, after=100, limit=5)
+    assert [x.id for x in paged] == [x.id for x in scanned if x.id > 100][:5]
+
+
+def test_query_follows_updates_and_deletes(repository):
+    params = {"market": "brisbane", "base_price.gt": "500", "currency": "USD"}
+    rate_converter = get_rate_converter(True)
+    size = len(repository)
+    version = repository.version(1)
+    listing = replace(
+        repository.get(1), market=Markets.get_by_code("brisbane"), base_price=999
+    )
+    repository.put(listing)
+    assert repository.version(1) != version
+    assert [x.id for x in filter_listings(repository, params, rate_converter)] == [1]
+    repository.delete(1)
+    assert repository.get(1) is None
+    assert list(filter_listings(repository, params, rate_converter)) == []
+    assert len(repository) == size - 1
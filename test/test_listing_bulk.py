@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from listing.store import ListingStore
+
+NDJSON = "application/x-ndjson"
+
+
+def ndjson(rows) -> str:
+    return "".join(json.dumps(row) + "\n" for row in rows)
+
+
+def test_bulk_json_array(client, persisted_listings, simple_listing):
+    resp = client.post("/listings/bulk", json=[simple_listing, simple_listing])
+    assert resp.status_code == 200
+    assert resp.json == {
+        "created": [{"row": 0, "id": 5}, {"row": 1, "id": 6}],
+        "errors": [],
+    }
+    assert client.get("/listings/6").json["title"] == simple_listing["title"]
+
+
+def test_bulk_ndjson_reports_errors_per_row(client, simple_listing):
+    body = "\n".join(
+        [
+            json.dumps(simple_listing),
+            "{not json",
+            json.dumps({**simple_listing, "market": "mars"}),
+            "",
+            json.dumps({**simple_listing, "base_price": None}),
+            json.dumps({**simple_listing, "unknown": 1}),
+            json.dumps([1]),
+            json.dumps({**simple_listing, "market": {}}),
+            json.dumps({**simple_listing, "host_name": 5}),
+            json.dumps(simple_listing),
+        ]
+    )
+    resp = client.post("/listings/bulk", data=body, content_type=NDJSON)
+    assert resp.status_code == 200
+    assert resp.json["created"] == [{"row": 0, "id": 1}, {"row": 8, "id": 2}]
+    errors = resp.json["errors"]
+    assert [error["row"] for error in errors] == [1, 2, 3, 4, 5, 6, 7]
+    assert errors[3]["message"] == "unknown data key=unknown"
+    assert len(client.get("/listings").json) == 2
+
+
+@pytest.mark.parametrize(
+    "data, content_type", [("{", "application/json"), ("{}", "application/json")]
+)
+def test_bulk_rejects_bad_body(client, data, content_type):
+    resp = client.post("/listings/bulk", data=data, content_type=content_type)
+    assert resp.status_code in (400, 422)
+    assert "message" in resp.json
+
+
+def test_bulk_commits_with_single_write(client, tmp_path, simple_listing):
+    store = ListingStore.for_dir(tmp_path)
+    appends = []
+    original = store._append
+    store._append = lambda entries, *args: (
+        appends.append(len(entries)) or original(entries, *args)
+    )
+    try:
+        body = ndjson([simple_listing] * 50)
+        client.post("/listings/bulk", data=body, content_type=NDJSON)
+    finally:
+        del store._append
+    assert appends == [50]
+
+
+def test_export_round_trips(client, persisted_listings, default_listings):
+    resp = client.get("/listings/export")
+    assert resp.status_code == 200
+    assert resp.mimetype == NDJSON
+    rows = [json.loads(line) for line in resp.data.decode().splitlines()]
+    assert rows == [x.to_dict() for x in default_listings]
+
+    resp = client.post("/listings/bulk", data=resp.data, content_type=NDJSON)
+    assert [x["id"] for x in resp.json["created"]] == [5, 6, 7, 8]
+    exported = client.get("/listings/export").data.decode().splitlines()
+    assert [json.loads(line)["title"] for line in exported[4:]] == [
+        x.title for x in default_listings
+    ]
@@ -0,0 +1,45 @@
+from dataclasses import replace
+
+import pytest
+from listing.model import Listing
+from listing.repository import ListingRepository
+from listing.store import ListingStore
+
+np = pytest.importorskip("numpy")
+
+from listing.columnar import ListingColumns  # noqa: E402
+
+
+@pytest.fixture
+def repository(tmp_path, random_listings):
+    Listing.write_to_file(random_listings, tmp_path)
+    return ListingRepository(ListingStore(tmp_path), columnar=True)
+
+
+def test_repository_uses_columns(repository):
+    repository.refresh()
+    assert isinstance(repository._index, ListingColumns)
+
+
+def test_columns_grow(random_listings):
+    columns = ListingColumns(capacity=4)
+    for listing in random_listings:
+        columns.add(listing)
+    assert columns.size == len(random_listings)
+    assert columns.query({"paris"}, [], {}).tolist() == [
+        x.id for x in random_listings if x.market.code == "paris"
+    ]
+
+
+def test_columns_reuse_rows_and_reclaim_dead_ones(random_listings):
+    columns = ListingColumns.build(random_listings[:10])
+    for price in range(5):
+        columns.remove(random_listings[0])
+        columns.add(replace(random_listings[0], base_price=price))
+    assert (columns.size, columns.dead) == (10, 0)
+    for listing in random_listings[1:7]:
+        columns.remove(listing)
+    assert columns.query(None, [("gte", 0)], {}).tolist() == [1, 8, 9, 10]
+    assert (columns.size, columns.dead) == (4, 0)
+    assert columns.row_of == {1: 0, 8: 1, 9: 2, 10: 3}
+    assert columns.base_price[0] == 4
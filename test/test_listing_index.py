@@ -0,0 +1,26 @@
+import pytest
+from listing.index import ListingIndex, price_range
+
+
+@pytest.mark.parametrize(
+    "op,price,expected",
+    [
+        ("e", 2, [2, 3]),
+        ("lt", 2, [1]),
+        ("lte", 2, [1, 2, 3]),
+        ("gt", 2, [4]),
+        ("gte", 2, [2, 3, 4]),
+    ],
+)
+def test_price_range(op, price, expected):
+    keys = [(1.0, 1), (2.0, 2), (2.0, 3), (3.0, 4)]
+    assert [_id for _, _id in price_range(keys, op, price)] == expected
+
+
+def test_build_matches_incremental_add(random_listings):
+    built = ListingIndex.build(random_listings)
+    added = ListingIndex()
+    for listing in random_listings:
+        added.add(listing)
+    assert built.prices == added.prices
+    assert built.by_market == added.by_market
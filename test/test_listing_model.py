@@ -0,0 +1,24 @@
+from dataclasses import asdict
+
+from listing.model import Listing
+from markets import Markets
+
+
+def test_to_dict_matches_asdict(random_listings):
+    for listing in random_listings:
+        assert listing.to_dict() == asdict(listing)
+
+
+def test_from_dict_interns_market_and_currency(listing):
+    loaded = Listing.from_dict(listing.to_dict())
+    assert loaded == listing
+    assert loaded.market is Markets.get_by_code(listing.market.code)
+    assert not hasattr(loaded, "__dict__")
+
+
+def test_unknown_market_kept(listing):
+    data = {
+        **listing.to_dict(),
+        "market": {"code": "x", "name": "X", "currency": "USD"},
+    }
+    assert Listing.from_dict(data).market.code == "x"
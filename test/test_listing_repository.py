@@ -0,0 +1,73 @@
+from dataclasses import replace
+
+import pytest
+from listing.model import Listing
+from listing.repository import ListingRepository
+from listing.store import ListingStore
+
+
+@pytest.fixture
+def repository(tmp_path, persisted_listings):
+    return ListingRepository(ListingStore(tmp_path))
+
+
+@pytest.fixture
+def load_calls(repository, monkeypatch):
+    calls = []
+    load = repository.store.load
+
+    def counting_load():
+        calls.append(1)
+        return load()
+
+    monkeypatch.setattr(repository.store, "load", counting_load)
+    return calls
+
+
+def test_loads_store_once(repository, load_calls):
+    assert repository.get(1).title == "san fran 100"
+    assert repository.get(4).title == "paris 100"
+    assert len(repository) == 4
+    assert len(load_calls) == 1
+
+
+def test_tails_writes_from_another_process(repository, load_calls, tmp_path, listing):
+    assert repository.get(5) is None
+    other_writer = ListingStore(tmp_path)
+    other_writer.put({**listing.to_dict(), "id": 5})
+    other_writer.delete(1)
+    assert repository.get(5).title == listing.title
+    assert 1 not in repository
+    assert len(load_calls) == 1, "log appends are replayed without a reload"
+
+
+def test_reloads_when_snapshot_replaced(repository, load_calls, tmp_path):
+    assert len(repository) == 4
+    Listing.write_to_file([], tmp_path)
+    assert len(repository) == 0
+    assert len(load_calls) == 2
+
+
+def test_put_and_delete(repository, tmp_path, listing):
+    listing.id = 5
+    repository.put(listing)
+    repository.delete(1)
+    assert repository.get(5) == listing
+    assert [x.id for x in Listing.existing(tmp_path)] == [2, 3, 4, 5]
+
+
+def test_own_writes_are_not_replayed(repository, tmp_path):
+    changed = []
+    repository.listeners.append(changed.append)
+    version = repository.version(3)
+    listing = replace(repository.get(3), title="renamed")
+    repository.put(listing)
+    assert repository.version(3) == repository.version(3) > version
+    repository.delete(2)
+    repository.put_many([listing])
+    assert repository.get(2) is None
+    assert changed == [3, 2, 3]
+    # a write from another process in between is still picked up
+    ListingStore(tmp_path).delete(4)
+    repository.delete(1)
+    assert [x.id for x in repository.values()] == [3]
@@ -0,0 +1,100 @@
+from dataclasses import replace
+
+import pytest
+from listing.model import Listing
+from listing.shared import (
+    SharedListingRepository,
+    SharedListings,
+    dumps,
+    shared_path,
+)
+from listing.store import ListingStore
+
+from app import app
+
+
+@pytest.fixture
+def repository(tmp_path, random_listings):
+    Listing.write_to_file(random_listings, tmp_path)
+    return SharedListingRepository(ListingStore(tmp_path))
+
+
+def test_round_trip(tmp_path, random_listings):
+    path = tmp_path / "listing.shared.1"
+    path.write_bytes(dumps(x.to_record() for x in reversed(random_listings)))
+    shared = SharedListings(path, 1)
+    assert len(shared) == len(random_listings)
+    assert [shared.listing(row) for row in range(len(shared))] == random_listings
+    assert shared.row_of(0) is None
+    assert shared.listing(shared.row_of(7)) == random_listings[6]
+
+
+def test_workers_swap_to_new_generation(tmp_path, repository):
+    # a second repository over its own store stands in for another worker
+    worker = SharedListingRepository(ListingStore(tmp_path))
+    repository.refresh()
+    worker.refresh()
+    generation = worker.store.generation()
+    assert repository._shared.generation == generation > 0
+
+    listing = replace(repository.get(2), title="renamed")
+    repository.put(listing)
+    assert worker.get(2).title == "renamed", "read from the log overlay"
+    assert worker._shared.generation == generation
+
+    repository.store.checkpoint()
+    assert worker.get(2).title == "renamed"
+    assert worker._shared.generation == generation + 1
+    assert worker._overlay == {}
+    repository.store.checkpoint()
+    assert worker.get(2).title == "renamed"
+    assert not shared_path(tmp_path / "data", generation).exists()
+
+
+def test_rewrite_published_meanwhile_is_not_republished(
+    tmp_path, repository, monkeypatch
+):
+    worker = SharedListingRepository(ListingStore(tmp_path))
+    repository.refresh()
+    worker.refresh()
+    generation = worker.store.generation()
+    repository.store.checkpoint()
+    # the worker checks the generation just before the checkpoint lands
+    stale = iter([generation])
+    current = worker.store.generation
+    monkeypatch.setattr(worker.store, "generation", lambda: next(stale, current()))
+    worker.refresh()
+    assert current() == worker._shared.generation == generation + 1
+
+
+def test_shared_store_left_unpublishing(tmp_path, random_listings):
+    store = ListingStore.for_dir(tmp_path)
+    SharedListingRepository(store).refresh()
+    assert store.publisher is None
+    store.replace_all(x.to_record() for x in random_listings[:3])
+    assert store.generation() == 1, "a plain rewrite publishes nothing"
+
+
+def test_unpublished_rewrite_is_published(tmp_path, repository, random_listings):
+    repository.refresh()
+    generation = repository.store.generation()
+    # a process not in shared mode rewriting the snapshot
+    ListingStore(tmp_path).replace_all(x.to_record() for x in random_listings[:10])
+    assert len(repository) == 10
+    assert repository.store.generation() == generation + 1
+
+
+def test_shared_mode_endpoints(client, persisted_listings):
+    app.config["LISTING_SHARED"] = True
+    try:
+        app.extensions.pop("listing_repositories", None)
+        assert len(client.get("/listings").json) == 4
+        resp = client.put("/listings/3", json={"base_price": 55})
+        assert resp.status_code == 200
+        assert client.get("/listings/3").json["base_price"] == 55
+        assert client.get("/listings/3/calendar").status_code == 200
+        assert client.delete("/listings/4").status_code == 200
+        assert [x["id"] for x in client.get("/listings").json] == [1, 2, 3]
+    finally:
+        app.config.pop("LISTING_SHARED")
+        app.extensions.pop("listing_repositories", None)
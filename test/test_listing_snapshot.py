@@ -0,0 +1,69 @@
+import json
+
+import pytest
+from currencies import Currencies
+from listing import snapshot
+from listing.model import Listing
+from listing.store import ListingStore
+from markets import Markets
+
+
+def write_legacy_snapshot(base_dir, listings):
+    data_dir = base_dir / "data"
+    data_dir.mkdir()
+    with open(data_dir / "listing.json", "w") as fp:
+        json.dump([x.to_dict() for x in listings], fp)
+
+
+def test_round_trip(random_listings):
+    records = [x.to_record() for x in random_listings]
+    records[0]["host_name"] = "Zoë"
+    loaded = snapshot.loads(snapshot.dumps(records))
+    assert [Listing.from_dict(x) for x in loaded] == [
+        Listing.from_dict(x) for x in records
+    ]
+
+
+def test_missing_fields_round_trip():
+    records = [{"id": 1, "title": "t", "base_price": 2.5}]
+    assert snapshot.loads(snapshot.dumps(records)) == records
+
+
+def test_smaller_than_json(random_listings):
+    binary = snapshot.dumps(x.to_record() for x in random_listings)
+    legacy = json.dumps([x.to_dict() for x in random_listings]).encode()
+    assert len(binary) * 3 < len(legacy)
+
+
+def test_rejects_unknown_version():
+    data = bytearray(snapshot.dumps([]))
+    data[4] = 99
+    with pytest.raises(ValueError):
+        snapshot.loads(bytes(data))
+
+
+def test_loaded_listings_share_registry_instances(tmp_path, random_listings):
+    Listing.write_to_file(random_listings, tmp_path)
+    for listing in Listing.existing(tmp_path):
+        assert listing.market is Markets.get_by_code(listing.market.code)
+        assert listing.currency is Currencies.get_by_code(listing.currency.code)
+
+
+def test_legacy_snapshot_read_and_migrated(tmp_path, default_listings):
+    write_legacy_snapshot(tmp_path, default_listings)
+    assert list(Listing.existing(tmp_path)) == default_listings
+    assert snapshot.migrate(tmp_path) == len(default_listings)
+    store = ListingStore.for_dir(tmp_path)
+    assert store.snapshot_path.exists()
+    assert not store.legacy_snapshot_path.exists()
+    assert list(Listing.existing(tmp_path)) == default_listings
+    assert snapshot.migrate(tmp_path) == 0
+
+
+def test_legacy_snapshot_replaced_by_compaction(tmp_path, default_listings, listing):
+    write_legacy_snapshot(tmp_path, default_listings)
+    store = ListingStore.for_dir(tmp_path)
+    Listing.save(listing, tmp_path)
+    store.compact(background=False)
+    assert not store.legacy_snapshot_path.exists()
+    assert sorted(x.id for x in Listing.existing(tmp_path)) == [0, 1, 2, 3, 4]
@@ -0,0 +1,127 @@
+import json
+import multiprocessing
+
+import pytest
+from listing import snapshot
+from listing.model import Listing
+from listing.store import ListingStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ListingStore(tmp_path, compact_threshold=10 * 1024 * 1024)
+
+
+def record(_id, title="title"):
+    return {"id": _id, "title": title, "base_price": 1.0}
+
+
+def test_put_appends_to_log(store):
+    store.put(record(1))
+    store.put(record(2))
+    assert store.snapshot_path.exists(), "empty snapshot written on first put"
+    assert snapshot.loads(store.snapshot_path.read_bytes()) == []
+    assert len(store.log_path.read_text().splitlines()) == 2
+    assert [x["id"] for x in store.records()] == [1, 2]
+
+
+def test_replay_update_keeps_position_and_delete_removes(store):
+    for _id in (1, 2, 3):
+        store.put(record(_id))
+    store.put(record(1, "updated"))
+    store.delete(2)
+    assert [(x["id"], x["title"]) for x in store.records()] == [
+        (1, "updated"),
+        (3, "title"),
+    ]
+
+
+def test_torn_trailing_line_is_ignored(store):
+    store.put(record(1))
+    with open(store.log_path, "a") as fp:
+        fp.write('{"op": "put", "listing": {"id": 2')
+    assert [x["id"] for x in store.records()] == [1]
+
+
+def test_append_after_torn_line(store):
+    store.put(record(1))
+    with open(store.log_path, "a") as fp:
+        fp.write('{"op": "put", "listing": {"id": 2, "ti')
+    store.put(record(3))
+    assert [x["id"] for x in store.records()] == [1, 3]
+    assert store.log_path.read_text().endswith("\n")
+
+
+def test_compact_folds_log_into_snapshot(store):
+    store.put(record(1))
+    store.put(record(2))
+    store.delete(1)
+    store.compact(background=False)
+    assert not store.log_path.exists()
+    assert not store.compacting_path.exists()
+    assert snapshot.loads(store.snapshot_path.read_bytes()) == [record(2)]
+
+
+def test_failed_fold_leaves_no_tmp_file(store):
+    store.put(record(1))
+    store.put({**record(2), "host_name": 5})
+    with pytest.raises(ValueError, match="listing id=2"):
+        store.compact(background=False)
+    assert not list(store.data_dir.glob("*.compact"))
+    assert [x["id"] for x in store.records()] == [1, 2]
+
+
+def test_background_compaction_past_threshold(tmp_path):
+    store = ListingStore(tmp_path, compact_threshold=256)
+    for _id in range(20):
+        store.put(record(_id))
+    store.wait_for_compaction()
+    assert snapshot.loads(store.snapshot_path.read_bytes()), "snapshot was compacted"
+    # lines appended while the fold ran may push the log past the threshold
+    # again, in which case this put starts another compaction
+    store.put(record(20))
+    store.wait_for_compaction()
+    assert [x["id"] for x in store.records()] == list(range(21))
+    assert not store.compacting_path.exists()
+    log_size = store.log_path.stat().st_size if store.log_path.exists() else 0
+    assert log_size < 256
+
+
+def test_write_to_file_replaces_log(tmp_path, listing):
+    Listing.save(listing, tmp_path)
+    Listing.write_to_file([], tmp_path)
+    assert list(Listing.existing(tmp_path)) == []
+    assert not (tmp_path / "data" / "listing.log").exists()
+
+
+def test_allocate_id_continues_after_existing_records(store):
+    store.put(record(7))
+    assert store.allocate_id() == 8
+    store.delete(8)
+    store.delete(7)
+    assert store.allocate_id() == 9, "ids are never reused"
+    store.replace_all([record(20)])
+    assert store.allocate_id() == 21
+    store.replace_all([])
+    assert store.allocate_id() == 22
+
+
+def create_listings(base_dir, count):
+    from listing.api import create_new_listing
+    from listing.repository import ListingRepository
+
+    repository = ListingRepository(ListingStore(base_dir, compact_threshold=4096))
+    data = {"title": "t", "base_price": 1, "currency": "USD", "market": "paris"}
+    replies = [create_new_listing(repository, data) for _ in range(count)]
+    return [json.loads(reply.body)["id"] for reply in replies]
+
+
+def test_concurrent_processes_lose_no_listings(tmp_path):
+    processes, per_process = 8, 40
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        results = pool.starmap(create_listings, [(tmp_path, per_process)] * processes)
+    ids = [_id for result in results for _id in result]
+    assert len(set(ids)) == len(ids) == processes * per_process
+    store = ListingStore(tmp_path)
+    assert sorted(x["id"] for x in store.records()) == sorted(ids)
+    assert not list(store.data_dir.glob("*.tmp")), "no temporary files left behind"
@@ -51,6 +51,35 @@ from listing.model import Listing
             },
             "bad price request",
         ),
+        (
+            {
+                "title": ["not", "a", "string"],
+                "base_price": 1,
+                "currency": "USD",
+                "market": "san-francisco",
+            },
+            "title not a string request",
+        ),
+        (
+            {
+                "title": "numeric host",
+                "base_price": 1,
+                "currency": "USD",
+                "market": "san-francisco",
+                "host_name": 5,
+            },
+            "host_name not a string request",
+        ),
+        (
+            {
+                "title": "unknown key",
+                "base_price": 1,
+                "currency": "USD",
+                "market": "san-francisco",
+                "rating": 5,
+            },
+            "unknown key request",
+        ),
     ],
 )
 def test_invalid_listing_requests(client, data, msg):
@@ -60,7 +89,7 @@ def test_invalid_listing_requests(client, data, msg):
 
 def test_create_simple_listing(client, simple_listing, tmp_path):
     resp = client.post("/listings", json=simple_listing)
-    listing_json = tmp_path / "data" / "listing.json"
+    listing_json = tmp_path / "data" / "listing.bin"
     pprint(resp.json)
     assert resp.status_code == 200
     assert listing_json.exists(), "should create json file here"
@@ -69,7 +98,7 @@ def test_create_simple_listing(client, simple_listing, tmp_path):
 def test_create_simple_listing_with_host_name(client, simple_listing, tmp_path):
     host_name = "John Smith"
     resp = client.post("/listings", json={**simple_listing, "host_name": host_name})
-    listing_json = tmp_path / "data" / "listing.json"
+    listing_json = tmp_path / "data" / "listing.bin"
     pprint(resp.json)
     assert resp.status_code == 200
     assert resp.json["host_name"] == host_name
@@ -186,3 +215,52 @@ def test_update_listing_to_eur(client, persisted_listings, tmp_path):
 def test_update_to_invalid(client, persisted_listings, tmp_path):
     resp = client.put(f"/listings/2", json={"market": "SAN_FRAN"})
     assert resp.status_code == 422
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"title": 5},
+        {"host_name": {"name": "x"}},
+        {"base_price": "nan"},
+        {"base_price": "-inf"},
+    ],
+)
+def test_update_to_unstorable_value(client, persisted_listings, data):
+    resp = client.put(f"/listings/2", json=data)
+    assert resp.status_code == 422
+
+
+def test_paginate_listings_with_cursor(client, persisted_listings):
+    resp = client.get("/listings?limit=3")
+    assert resp.status_code == 200
+    assert [r["id"] for r in resp.json] == [1, 2, 3]
+    cursor = resp.headers["X-Next-Cursor"]
+    resp = client.get(f"/listings?limit=3&cursor={cursor}")
+    assert [r["id"] for r in resp.json] == [4]
+    assert "X-Next-Cursor" not in resp.headers, "last page"
+
+
+def test_paginate_filtered_listings(client, persisted_listings):
+    resp = client.get("/listings?market=paris&limit=1&cursor=1")
+    assert [r["id"] for r in resp.json] == [3]
+    assert resp.headers["X-Next-Cursor"] == "3"
+
+
+@pytest.mark.parametrize("query_param", ["?limit=0", "?limit=a", "?cursor=-1"])
+def test_invalid_pagination(client, persisted_listings, query_param):
+    resp = client.get(f"/listings{query_param}")
+    assert resp.status_code == 422
+
+
+@pytest.mark.parametrize(
+    "query_param", ["", "?market=paris", "?market=nowhere", "?limit=2"]
+)
+def test_stream_listings_matches_json(client, persisted_listings, query_param):
+    expected = client.get(f"/listings{query_param}")
+    separator = "&" if query_param else "?"
+    resp = client.get(f"/listings{query_param}{separator}stream=true")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.json == expected.json
+    assert resp.get_data() == expected.get_data()
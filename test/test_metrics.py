@@ -0,0 +1,75 @@
+import re
+
+import pytest
+
+from metrics import Counter, Histogram, Registry, Timer
+
+
+def sample(text, name, **labels):
+    selector = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    line = re.escape(f"{name}{{{selector}}}" if labels else name)
+    match = re.search(rf"^{line} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram("latency", "help", ("stage",), (0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.labels("a").observe(value)
+    text = registry.render()
+    assert "# TYPE latency histogram" in text
+    assert sample(text, "latency_bucket", stage="a", le="0.1") == 2
+    assert sample(text, "latency_bucket", stage="a", le="1.0") == 3
+    assert sample(text, "latency_bucket", stage="a", le="+Inf") == 4
+    assert sample(text, "latency_count", stage="a") == 4
+    assert sample(text, "latency_sum", stage="a") == pytest.approx(3.65)
+
+
+def test_counter_and_label_escaping():
+    registry = Registry()
+    counter = registry.counter("hits_total", "help")
+    counter.inc()
+    counter.inc(2)
+    labelled = registry.counter("errors_total", "help", ("path",))
+    labelled.labels('a"b').inc()
+    text = registry.render()
+    assert sample(text, "hits_total") == 3
+    assert 'errors_total{path="a\\"b"} 1' in text
+    with pytest.raises(ValueError):
+        labelled.labels()
+    with pytest.raises(ValueError):
+        registry.counter("hits_total", "again")
+
+
+def test_timer_observes_elapsed_time():
+    histogram = Histogram("timer", "help")
+    with Timer(histogram.labels()):
+        pass
+    assert histogram.labels().count == 1
+    assert isinstance(Counter("c", "help").value, int)
+
+
+def test_metrics_endpoint(client, persisted_listings):
+    before = client.get("/metrics").data.decode()
+    client.get("/listings?base_price.gte=50&currency=USD")
+    client.get("/listings/1/calendar?granularity=month")
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/plain"
+    text = resp.data.decode()
+    for stage in ("filter_listings", "latest_rates", "build_calendar_summary"):
+        name = "listing_api_stage_seconds_count"
+        assert (
+            sample(text, name, stage=stage)
+            == (sample(before, name, stage=stage) or 0) + 1
+        )
+    assert (
+        sample(text, "listing_api_request_seconds_count", endpoint="get_listings")
+        == (
+            sample(before, "listing_api_request_seconds_count", endpoint="get_listings")
+            or 0
+        )
+        + 1
+    )
+    assert sample(text, "listing_api_listing_reloads_total") >= 1
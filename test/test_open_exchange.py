@@ -1,5 +1,5 @@
 import pytest
-from open_exchange import convert_rate
+from open_exchange import RatesSnapshot, convert_rate
 
 
 @pytest.fixture
@@ -16,3 +16,17 @@ def test_convert_to_EUR(rate_fixture):
     out = convert_rate(rate_fixture, "EUR")
     assert out["EUR"] == 1
     assert out["USD"] > 1
+
+
+def test_snapshot_cross_rates(rate_fixture):
+    snapshot = RatesSnapshot.from_usd(rate_fixture)
+    assert snapshot.usd == rate_fixture
+    for base in rate_fixture:
+        assert snapshot.rates_for(base) == convert_rate(rate_fixture, base)
+    assert snapshot.rates_for("XXX") == {}
+
+
+def test_rates_status(client):
+    resp = client.get("/rates/status")
+    assert resp.status_code == 200
+    assert resp.json["age_seconds"] < 60
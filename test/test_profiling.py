@@ -0,0 +1,93 @@
+import marshal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import listing.api
+import pytest
+
+from app import app
+from profiling import ProfileStore
+
+
+@pytest.fixture
+def profiling(client):
+    app.config.update(PROFILING_TOKEN="secret", PROFILE_THRESHOLD_MS=0)
+    yield {"X-Profile": "secret"}
+    for key in ("PROFILING", "PROFILING_TOKEN", "PROFILE_THRESHOLD_MS"):
+        app.config.pop(key, None)
+
+
+def test_profile_on_admin_header(client, persisted_listings, profiling):
+    assert "X-Profile-Name" not in client.get("/listings").headers
+    assert (
+        "X-Profile-Name"
+        not in client.get("/listings", headers={"X-Profile": "guess"}).headers
+    )
+    resp = client.get("/listings/1/calendar", headers=profiling)
+    name = resp.headers["X-Profile-Name"]
+    assert name.endswith("-listing_calendar-" + name.split("-")[-1])
+
+    entries = client.get("/profiles", headers=profiling).json
+    assert [entry["name"] for entry in entries] == [name]
+    assert entries[0]["endpoint"] == "listing_calendar"
+
+    data = client.get(f"/profiles/{name}", headers=profiling).data
+    stats = marshal.loads(data)
+    assert any(func[2] == "build_calendar" for func in stats)
+
+
+def test_profile_everything_over_threshold(client, persisted_listings, profiling):
+    app.config.update(PROFILING=True, PROFILE_THRESHOLD_MS=60_000)
+    assert "X-Profile-Name" not in client.get("/listings").headers
+    app.config["PROFILE_THRESHOLD_MS"] = 0
+    assert "X-Profile-Name" in client.get("/listings").headers
+    assert "X-Profile-Name" in client.get("/listings/100").headers
+
+
+def test_overlapping_requests_profiled_one_at_a_time(
+    client, persisted_listings, profiling, monkeypatch
+):
+    app.config["PROFILING"] = True
+    entered, release = threading.Event(), threading.Event()
+    build_calendar = listing.api.build_calendar
+
+    def blocking_build_calendar(listing, *args, **kwargs):
+        if listing.id == 1:
+            entered.set()
+            release.wait(5)
+        return build_calendar(listing, *args, **kwargs)
+
+    monkeypatch.setattr(listing.api, "build_calendar", blocking_build_calendar)
+    with ThreadPoolExecutor(1) as pool:
+        first = pool.submit(app.test_client().get, "/listings/1/calendar")
+        assert entered.wait(5)
+        second = client.get("/listings/2/calendar")
+        release.set()
+        first = first.result()
+    assert first.status_code == second.status_code == 200
+    assert "X-Profile-Name" in first.headers
+    assert "X-Profile-Name" not in second.headers, "served unprofiled"
+    assert "X-Profile-Name" in client.get("/listings").headers
+
+
+@pytest.mark.parametrize(
+    "url,headers,status",
+    [
+        ("/profiles", {}, 403),
+        ("/profiles", {"X-Profile": "guess"}, 403),
+        ("/profiles/x", {"X-Profile": "secret"}, 404),
+        ("/profiles/..%2Fdata%2Flisting.bin", {"X-Profile": "secret"}, 404),
+    ],
+)
+def test_profiles_endpoint_restricted(client, profiling, url, headers, status):
+    assert client.get(url, headers=headers).status_code == status
+
+
+def test_ring_buffer_keeps_newest(tmp_path):
+    store = ProfileStore(tmp_path, keep=3)
+    names = [store.save(b"x", "get_listings", i / 1000, "prof") for i in range(5)]
+    entries = store.entries()
+    assert [entry.name for entry in entries] == names[:1:-1]
+    assert entries[0].duration_ms == 4
+    assert store.read(names[0]) is None
+    assert store.read(names[-1]) == b"x"
@@ -0,0 +1,104 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+from app import app
+from open_exchange import convert_rate
+from rate_history import RateHistory
+
+DAY = date(2022, 1, 3)
+DAILY = {
+    DAY: {"USD": 1, "EUR": 0.8, "JPY": 110.0},
+    DAY + timedelta(days=2): {"USD": 1, "EUR": 0.9},
+}
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = RateHistory.build(tmp_path / "rates_history.bin", DAILY)
+    yield history
+    history.close()
+
+
+def test_lookup_by_day_and_currency(history):
+    assert history.rate(DAY, "EUR") == 0.8
+    assert history.rate(DAY, "XXX") is None
+    assert history.rate(DAY + timedelta(days=2), "EUR") == 0.9
+    assert history.days == 3
+
+
+def test_gaps_and_later_days_carry_rates_forward(history):
+    assert history.rate(DAY + timedelta(days=1), "EUR") == 0.8
+    assert history.rate(DAY + timedelta(days=2), "JPY") == 110.0
+    assert history.usd_rates(DAY + timedelta(days=30)) == history.usd_rates(
+        history.last_day
+    )
+
+
+def test_days_before_history_raise(history):
+    with pytest.raises(KeyError):
+        history.rate(DAY - timedelta(days=1), "EUR")
+
+
+def test_rates_for_base_currency(history):
+    assert history.rates_for(DAY, "EUR") == convert_rate(DAILY[DAY], "EUR")
+
+
+@pytest.mark.parametrize(
+    "listing_code,code",
+    [("EUR", "USD"), ("USD", "EUR"), ("JPY", "EUR"), ("AUD", "EUR")],
+)
+def test_currency_factors_match_rates_for(history, listing_code, code):
+    factors = history.currency_factors(DAY, 5, listing_code, code)
+    assert factors == [
+        history.rates_for(DAY + timedelta(days=day), code).get(listing_code, 1)
+        for day in range(5)
+    ]
+
+
+def test_from_bulk_files(tmp_path):
+    for day, rates in DAILY.items():
+        (tmp_path / f"{day.isoformat()}.json").write_text(json.dumps({"rates": rates}))
+    history = RateHistory.from_bulk_files(
+        tmp_path / "history.bin", sorted(tmp_path.glob("*.json"))
+    )
+    assert history.first_day == DAY
+    assert history.rate(DAY + timedelta(days=2), "EUR") == 0.9
+    history.close()
+
+
+@pytest.fixture
+def app_history(history):
+    app.rate_converter.history = history
+    yield history
+    app.rate_converter.history = None
+
+
+def test_calendar_as_of_uses_daily_rates(client, persisted_listings, app_history):
+    resp = client.get(f"/listings/3/calendar?currency=USD&as_of={DAY.isoformat()}")
+    assert resp.status_code == 200
+    data = resp.json
+    assert data[0]["date"] == DAY.isoformat()
+    # listing 3 is 10 EUR in paris; Monday, then Wednesday at the new rate
+    assert data[0]["price"] == 10 / 0.8
+    assert data[2]["price"] == 10 / 0.9
+
+
+def test_calendar_as_of_before_history(client, persisted_listings, app_history):
+    resp = client.get("/listings/3/calendar?currency=USD&as_of=2000-01-01")
+    assert resp.status_code == 422
+
+
+def test_calendar_as_of_without_history(client, persisted_listings):
+    resp = client.get(f"/listings/3/calendar?currency=USD&as_of={DAY.isoformat()}")
+    assert resp.status_code == 422
+
+
+def test_filter_listings_as_of(client, persisted_listings, app_history):
+    as_of = (DAY + timedelta(days=2)).isoformat()
+    resp = client.get(f"/listings?base_price.gte=11&currency=USD&as_of={as_of}")
+    assert resp.status_code == 200
+    # 11 USD was 9.9 EUR that day, so the 10 EUR paris listing matches
+    assert [r["id"] for r in resp.json] == [1, 3, 4]
+    latest = client.get("/listings?base_price.gte=11&currency=USD")
+    assert [r["id"] for r in latest.json] == [1, 4]
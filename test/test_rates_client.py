@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from metrics import RATES_CACHE_HITS, RATES_CACHE_MISSES
+from open_exchange import RateRefresher, RatesClient
+
+RATES = {"AUD": 1.358192, "EUR": 0.847971, "ILS": 3.264521, "JPY": 110.286, "USD": 1}
+
+
+class StubRates:
+    def __init__(self):
+        self.calls = 0
+        self.delay = 0.0
+        self.status = 200
+        self.lock = threading.Lock()
+
+
+@pytest.fixture
+def stub():
+    state = StubRates()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            with state.lock:
+                state.calls += 1
+            time.sleep(state.delay)
+            body = json.dumps({"rates": RATES}).encode()
+            self.send_response(state.status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.url = f"http://127.0.0.1:{server.server_port}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_and_cache(stub):
+    client = RatesClient(api_key="key", url=stub.url)
+    assert client.latest_rates("USD") == RATES
+    assert client.latest_rates("USD") == RATES
+    for code in RATES:
+        assert client.latest_rates(code)[code] == 1
+    assert stub.calls == 1, "every base currency is derived from one USD fetch"
+
+
+def test_cache_hits_and_misses_counted(stub):
+    client = RatesClient(api_key="key", url=stub.url)
+    hits, misses = RATES_CACHE_HITS.value, RATES_CACHE_MISSES.value
+    client.latest_rates("USD")
+    client.latest_rates("EUR")
+    assert (RATES_CACHE_HITS.value - hits, RATES_CACHE_MISSES.value - misses) == (1, 1)
+
+
+def test_stale_snapshot_served_while_refreshing(stub):
+    client = RatesClient(api_key="key", url=stub.url, ttl=0)
+    first = client.snapshot()
+    stub.delay = 0.2
+    assert client.snapshot() is first, "stale snapshot returned without waiting"
+    client.wait_for_refresh()
+    assert stub.calls == 2
+    assert client.snapshot().id > first.id
+
+
+def test_failed_refresh_keeps_last_good_snapshot(stub):
+    client = RatesClient(api_key="key", url=stub.url)
+    first = client.snapshot()
+    stub.status = 500
+    assert client.refresh() is first
+    assert client.latest_rates("USD") == RATES
+
+
+def test_snapshot_persisted_for_cold_start(stub, tmp_path):
+    path = tmp_path / "data" / "rates.json"
+    client = RatesClient(api_key="key", url=stub.url, snapshot_path=path)
+    fetched = client.snapshot()
+    assert path.exists()
+    stub.status = 500
+    cold = RatesClient(api_key="key", url=stub.url, snapshot_path=path, ttl=3600)
+    assert cold.latest_rates("EUR") == fetched.rates_for("EUR")
+    assert cold.snapshot().fetched_at == fetched.fetched_at
+    assert stub.calls == 1, "served from disk without a fetch"
+
+
+def test_snapshot_installed_when_save_fails(stub, tmp_path):
+    (tmp_path / "data").write_text("not a directory")
+    path = tmp_path / "data" / "rates.json"
+    client = RatesClient(api_key="key", url=stub.url, snapshot_path=path)
+    assert client.latest_rates("USD") == RATES
+    assert client.snapshot().rates_for("USD") == RATES
+    assert stub.calls == 1
+
+
+def test_refresher_updates_snapshot(stub):
+    client = RatesClient(api_key="key", url=stub.url, ttl=3600)
+    refresher = RateRefresher(client, interval=0.01).start()
+    time.sleep(0.1)
+    refresher.stop()
+    assert stub.calls > 1
+    assert client.snapshot().age() < 1
+
+
+def test_concurrent_misses_share_one_fetch(stub):
+    stub.delay = 0.2
+    client = RatesClient(api_key="key", url=stub.url)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda _: client.latest_rates("USD"), range(16)))
+    assert stub.calls == 1
+    assert all(result == RATES for result in results)
+
+
+def test_read_timeout_returns_no_rates(stub):
+    stub.delay = 0.5
+    client = RatesClient(api_key="key", url=stub.url, timeout=(1, 0.05))
+    assert client.latest_rates("USD") == {}
+
+
+def test_failures_are_not_cached(stub):
+    stub.status = 500
+    client = RatesClient(api_key="key", url=stub.url)
+    assert client.latest_rates("USD") == {}
+    stub.status = 200
+    assert client.latest_rates("USD") == RATES
+    assert stub.calls == 2
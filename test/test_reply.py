@@ -0,0 +1,68 @@
+import json
+
+import pytest
+import reply
+from app import app
+from calendar_api import build_calendar
+from flask import jsonify
+
+
+def flask_stdlib_dumps(obj) -> bytes:
+    return json.dumps(
+        obj,
+        default=reply.default,
+        ensure_ascii=True,
+        sort_keys=True,
+        separators=(",", ":"),
+    ).encode()
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def encoder(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(reply, "orjson", None)
+    return reply.dumpb
+
+
+def test_listings_byte_compatible(encoder, random_listings):
+    payload = [x.to_dict() for x in random_listings]
+    assert encoder(payload) == flask_stdlib_dumps(payload)
+    assert encoder(random_listings) == flask_stdlib_dumps(random_listings)
+
+
+def test_calendar_byte_compatible(encoder, listing):
+    rows = list(build_calendar(listing, 0.94, "EUR"))
+    assert encoder(rows) == flask_stdlib_dumps(rows)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        1e16,
+        1.2345678901234568e17,
+        1e-5,
+        1.5e-7,
+        5e-324,
+        0.30000000000000004,
+        -0.0,
+        2**70,
+        "€ ₪ ¥ 😀 \x7f \n \x01",
+        {"b": [1, None, True], "a": {"z": 0.1}},
+    ],
+)
+def test_edge_values_byte_compatible(encoder, value):
+    assert encoder(value) == flask_stdlib_dumps(value)
+
+
+def test_unserializable_raises_type_error(encoder):
+    with pytest.raises(TypeError):
+        encoder({"a": object()})
+
+
+def test_flask_provider_matches_default():
+    with app.app_context():
+        data = {"symbol": "€", "price": 1e-5, "when": None}
+        assert jsonify(data).get_data() == flask_stdlib_dumps(data) + b"\n"
+        assert app.json.loads(b'{"a": [1, 2.5]}') == {"a": [1, 2.5]}